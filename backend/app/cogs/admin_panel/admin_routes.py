@@ -1,12 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from app.cogs import models, schemas, auth
-from app.cogs.get_db import get_db
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cogs import models, schemas, auth, database
+from app.cogs.get_db import get_async_db
 from app.cogs.admin_panel.admin_guard import require_admin
+from app.cogs.admin_panel import audit_logger
+from app.cogs.admin_panel.audit_writer import audit_writer
+from starlette.concurrency import run_in_threadpool
 from app.cogs.schemas import ResetPasswordRequest
+from app.cogs.lookup_cache import invalidate_user
 from typing import List
+from datetime import datetime, timezone
+from app.configurations.config import AUDIT_SYNC_TIMEOUT, AUDIT_EXPORT_BATCH
 import csv
+import json
+import base64
+import zlib
 from io import StringIO
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
@@ -18,18 +28,16 @@ def validate_action(current_user: models.User, target_user: models.User):
     if target_user.role == "admin" and not current_user.is_superadmin:
         raise HTTPException(status_code=403, detail="רק סופר אדמין יכול לבצע פעולה על מנהלים אחרים")
 
-def log_action(db: Session, performed_by: str, action: str, details: str = None):
-    log = models.AuditLog(performed_by=performed_by, action=action, details=details)
-    db.add(log)
-    db.commit()
+async def log_action(db: AsyncSession, performed_by: str, action: str, details: str = None, sync: bool = False):
+    await audit_logger.log_action_async(db, action, performed_by, details, sync=sync)
 
 @router.post("/users", response_model=schemas.UserAdminView)
-def create_user(
+async def create_user(
     user_data: schemas.CreateUserRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(require_admin)
 ):
-    if db.query(models.User).filter_by(email=user_data.email).first():
+    if await db.scalar(select(models.User).filter_by(email=user_data.email)):
         raise HTTPException(status_code=400, detail="המשתמש כבר קיים")
 
     if user_data.role == "admin" and not current_user.is_superadmin:
@@ -41,20 +49,20 @@ def create_user(
         role=user_data.role if user_data.role in ["user", "admin"] else "user"
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
-    log_action(db, current_user.email, "יצירת משתמש", f"{new_user.role} נוצר משתמש: {new_user.email} עם הרשאה")
+    await log_action(db, current_user.email, "יצירת משתמש", f"{new_user.role} נוצר משתמש: {new_user.email} עם הרשאה")
 
     return new_user
 
 @router.put("/users/{user_id}/change-role")
-def change_user_role(
+async def change_user_role(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(require_admin)
 ):
-    user = db.query(models.User).filter_by(id=user_id).first()
+    user = await db.scalar(select(models.User).filter_by(id=user_id))
     if not user:
         raise HTTPException(status_code=404, detail="משתמש לא נמצא")
 
@@ -62,7 +70,8 @@ def change_user_role(
 
     old_role = user.role
     user.role = "user" if user.role == "admin" else "admin"
-    db.commit()
+    await db.commit()
+    invalidate_user(user.email)
 
     role_display = {
     "user": "משתמש רגיל",
@@ -70,110 +79,195 @@ def change_user_role(
     }
     old_role_he = role_display.get(old_role, old_role)
     new_role_he = role_display.get(user.role, user.role)
-    log_action(db, current_user.email, "שינוי הרשאה", f"{user.email} מ-{old_role_he} ל-{new_role_he} בוצע על המשתמש")
+    await log_action(db, current_user.email, "שינוי הרשאה", f"{user.email} מ-{old_role_he} ל-{new_role_he} בוצע על המשתמש")
 
     return {"detail": "הרשאה שונתה בהצלחה", "new_role": user.role}
 
 @router.put("/users/{user_id}/toggle-active")
-def toggle_user_active(
+async def toggle_user_active(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(require_admin)
 ):
-    user = db.query(models.User).filter_by(id=user_id).first()
+    user = await db.scalar(select(models.User).filter_by(id=user_id))
     if not user:
         raise HTTPException(status_code=404, detail="משתמש לא נמצא")
 
     validate_action(current_user, user)
 
     user.is_active = not user.is_active
-    db.commit()
+    await db.commit()
+    invalidate_user(user.email)
 
-    log_action(db, current_user.email, "שינוי סטטוס", f"{user.email} -> {'פעיל' if user.is_active else 'לא פעיל'}")
+    await log_action(db, current_user.email, "שינוי סטטוס", f"{user.email} -> {'פעיל' if user.is_active else 'לא פעיל'}")
 
     return {"detail": "סטטוס עודכן", "is_active": user.is_active}
 
 @router.put("/users/{user_id}/reset-password")
-def reset_password(
+async def reset_password(
     user_id: int,
     data: ResetPasswordRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(require_admin)
 ):
-    user = db.query(models.User).filter_by(id=user_id).first()
+    user = await db.scalar(select(models.User).filter_by(id=user_id))
     if not user:
         raise HTTPException(status_code=404, detail="משתמש לא נמצא")
 
     validate_action(current_user, user)
 
     user.password_hash = auth.get_password_hash(data.new_password)
-    db.commit()
-
-    log_action(db, current_user.email, "איפוס סיסמה", f"בוצע איפוס עבור {user.email}")
+    await log_action(db, current_user.email, "איפוס סיסמה", f"בוצע איפוס עבור {user.email}", sync=True)
+    await db.commit()
+    invalidate_user(user.email)
 
     return {"detail": "סיסמה אופסה בהצלחה"}
 
 @router.delete("/users/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(require_admin)
 ):
-    user = db.query(models.User).filter_by(id=user_id).first()
+    user = await db.scalar(select(models.User).filter_by(id=user_id))
     if not user:
         raise HTTPException(status_code=404, detail="משתמש לא נמצא")
 
     validate_action(current_user, user)
 
-    db.delete(user)
-    db.commit()
-
-    log_action(db, current_user.email, "מחיקת משתמש", f"{user.email}")
+    await db.delete(user)
+    await log_action(db, current_user.email, "מחיקת משתמש", f"{user.email}", sync=True)
+    await db.commit()
+    invalidate_user(user.email)
 
     return {"detail": "המשתמש נמחק בהצלחה"}
 
+def encode_audit_cursor(log: models.AuditLog) -> str:
+    key = [log.timestamp.isoformat(), log.id]
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode()
+
+def decode_audit_cursor(cursor: str) -> tuple:
+    try:
+        timestamp, log_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _utc(value: datetime) -> datetime:
+    # הטבלה שומרת utcnow בלי אזור זמן
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+def audit_log_query(actor: str | None, action: str | None, start: datetime | None, end: datetime | None):
+    # החדשים קודם; (timestamp, id) הוא מפתח המיון והדפדוף, וכל סינון נשען על אחד האינדקסים המורכבים
+    query = select(models.AuditLog).order_by(models.AuditLog.timestamp.desc(), models.AuditLog.id.desc())
+    if actor:
+        query = query.where(models.AuditLog.performed_by == actor)
+    if action:
+        query = query.where(models.AuditLog.action == action)
+    if start:
+        query = query.where(models.AuditLog.timestamp >= _utc(start))
+    if end:
+        query = query.where(models.AuditLog.timestamp < _utc(end))
+    return query
+
 @router.get("/audit-log", response_model=List[schemas.AuditLogEntry])
-def get_audit_log(
-    db: Session = Depends(get_db),
+async def get_audit_log(
+    response: Response,
+    actor: str | None = None,
+    action: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(require_admin)
 ):
-    return db.query(models.AuditLog).order_by(models.AuditLog.timestamp.desc()).all()
+    # רשומות שעוד מחכות בתור נכתבות קודם, כדי שהאדמין יראה גם את מה שהוא עשה הרגע
+    if cursor is None:
+        await run_in_threadpool(audit_writer.flush, AUDIT_SYNC_TIMEOUT)
+
+    query = audit_log_query(actor, action, start, end)
+    if cursor:
+        query = query.where(tuple_(models.AuditLog.timestamp, models.AuditLog.id) < decode_audit_cursor(cursor))
+
+    logs = (await db.scalars(query.limit(limit + 1))).all()
+    if len(logs) > limit:
+        logs = logs[:limit]
+        response.headers["X-Next-Cursor"] = encode_audit_cursor(logs[-1])
+    return logs
 
 @router.delete("/audit-log/clear")
-def clear_audit_log(
-    db: Session = Depends(get_db),
+async def clear_audit_log(
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(require_admin)
 ):
     if not current_user.is_superadmin:
         raise HTTPException(status_code=403, detail="רק סופר אדמין יכול לאפס את הלוגים")
     
-    db.query(models.AuditLog).delete()
-    db.commit()
+    await run_in_threadpool(audit_writer.flush, AUDIT_SYNC_TIMEOUT)
+    await db.execute(delete(models.AuditLog))
+    await db.commit()
     return {"detail": "הלוגים אופסו בהצלחה"}
 
-@router.get("/audit-log/export")
-def export_audit_log_csv(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_admin)
-):
-    logs = db.query(models.AuditLog).order_by(models.AuditLog.timestamp.desc()).all()
-
+async def audit_csv_chunks(actor: str | None, action: str | None, start: datetime | None, end: datetime | None):
+    # CSV in keyset batches of AUDIT_EXPORT_BATCH rows, one chunk per batch. Runs in a session
+    # of its own: the request's session is already closed while the body is streamed.
     output = StringIO()
+    writer = csv.writer(output)
     # כתיבת BOM עבור תמיכה בעברית ב-Excel
     output.write('\ufeff')
-
-    writer = csv.writer(output)
     writer.writerow(["timestamp", "action", "performed_by", "details"])
+    yield output.getvalue().encode("utf-8")
+
+    # עמודות בלבד, בלי אובייקטי ORM – זול יותר וה־Session לא צובר כלום
+    log = models.AuditLog
+    query = audit_log_query(actor, action, start, end).with_only_columns(
+        log.timestamp, log.action, log.performed_by, log.details, log.id
+    ).limit(AUDIT_EXPORT_BATCH)
+    after = None
+    async with database.AsyncSessionLocal() as db:
+        while True:
+            batch_query = query if after is None else query.where(
+                tuple_(log.timestamp, log.id) < after
+            )
+            rows = (await db.execute(batch_query)).all()
+            if not rows:
+                return
+
+            output = StringIO()
+            writer = csv.writer(output)
+            for entry in rows:
+                writer.writerow([entry.timestamp.strftime("%Y-%m-%d %H:%M:%S"), entry.action, entry.performed_by, entry.details or ""])
+            yield output.getvalue().encode("utf-8")
+
+            if len(rows) < AUDIT_EXPORT_BATCH:
+                return
+            after = (rows[-1].timestamp, rows[-1].id)
+
+async def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 – gzip header/trailer
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
 
-    for log in logs:
-        writer.writerow([
-            log.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-            log.action,
-            log.performed_by,
-            log.details or ""
-        ])
-
-    output.seek(0)
-    return StreamingResponse(output, media_type="text/csv", headers={
+@router.get("/audit-log/export")
+async def export_audit_log_csv(
+    actor: str | None = None,
+    action: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    compress: bool = Query(False, alias="gzip"),
+    current_user: models.User = Depends(require_admin)
+):
+    await run_in_threadpool(audit_writer.flush, AUDIT_SYNC_TIMEOUT)
+
+    chunks = audit_csv_chunks(actor, action, start, end)
+    if compress:
+        return StreamingResponse(gzip_chunks(chunks), media_type="application/gzip", headers={
+            "Content-Disposition": "attachment; filename=audit_logs.csv.gz"
+        })
+    return StreamingResponse(chunks, media_type="text/csv", headers={
         "Content-Disposition": "attachment; filename=audit_logs.csv"
     })
\ No newline at end of file
@@ -1,7 +1,19 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.cogs.models import AuditLog
+from app.cogs.admin_panel.audit_writer import AuditEntry, audit_writer
 
-def log_action(db: Session, action: str, performed_by: str, details: str = None):
-    log_entry = AuditLog(action=action, performed_by=performed_by, details=details)
-    db.add(log_entry)
-    db.commit()
\ No newline at end of file
+# הרשומה נכתבת ע"י audit_writer יחד עם שאר הרשומות, לא ב־commit נפרד על db.
+# sync=True – הרשומה נוספת לטרנזקציה של הקורא (בלי commit), כך שהפעולה והתיעוד שלה
+# נשמרים יחד או לא נשמרים בכלל. הקורא קורא לזה לפני ה־commit שלו.
+def log_action(db: Session | None, action: str, performed_by: str, details: str = None, sync: bool = False):
+    if sync:
+        db.add(AuditLog(**AuditEntry(action, performed_by, details).row))
+        return
+    audit_writer.submit(action, performed_by, details)
+
+async def log_action_async(db: AsyncSession | None, action: str, performed_by: str, details: str = None, sync: bool = False):
+    if sync:
+        db.add(AuditLog(**AuditEntry(action, performed_by, details).row))
+        return
+    audit_writer.submit(action, performed_by, details)
\ No newline at end of file
@@ -0,0 +1,113 @@
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import insert
+from app.cogs import database
+from app.cogs.models import AuditLog
+from app.configurations.config import AUDIT_BATCH_SIZE, AUDIT_FLUSH_WINDOW, AUDIT_RETRIES
+
+class AuditEntry:
+    def __init__(self, action: str, performed_by: str, details: str | None):
+        # הזמן נקבע ברגע הפעולה, לא ברגע הכתיבה
+        self.row = {"timestamp": datetime.utcnow(), "action": action, "performed_by": performed_by, "details": details}
+        self.ok = False
+        self._done = threading.Event()
+
+    def finish(self, ok: bool):
+        self.ok = ok
+        self._done.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        # True once the entry is committed
+        return self._done.wait(timeout) and self.ok
+
+class AuditWriter:
+    # Group commit: one thread writes everything that arrived within the flush window
+    # (up to batch_size rows) in a single transaction, instead of a commit per action.
+    def __init__(self, batch_size: int = AUDIT_BATCH_SIZE, window: float = AUDIT_FLUSH_WINDOW):
+        self.batch_size = batch_size
+        self.window = window
+        self._queue = queue.Queue()
+        self._condition = threading.Condition()
+        self._submitted = 0  # sequence number of the last entry queued
+        self._done = 0  # entries written or given up on – the queue is FIFO, so always a prefix
+        self._started = False
+        self.written = 0
+        self.failed = 0
+
+    def start(self):
+        with self._condition:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, action: str, performed_by: str, details: str | None = None) -> AuditEntry:
+        self.start()
+        entry = AuditEntry(action, performed_by, details)
+        with self._condition:
+            self._submitted += 1
+            self._queue.put(entry)
+        return entry
+
+    def flush(self, timeout: float | None = None) -> bool:
+        # Waits until everything queued so far was written or given up on – entries
+        # submitted after the call don't keep it waiting
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            target = self._submitted
+            while self._done < target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _take_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.batch_size:
+            try:
+                remaining = deadline - time.monotonic()
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list) -> bool:
+        for attempt in range(AUDIT_RETRIES + 1):
+            db = database.SessionLocal()
+            try:
+                db.execute(insert(AuditLog), [entry.row for entry in batch])
+                db.commit()
+                return True
+            except Exception as e:
+                db.rollback()
+                logging.warning("⚠️ Audit Log Write Failed (%d rows, attempt %d): %s", len(batch), attempt + 1, e)
+            finally:
+                db.close()
+            if attempt < AUDIT_RETRIES:
+                time.sleep(min(2 ** attempt, 10))
+
+        # לא נעלמות בשקט – לפחות בלוג של התהליך
+        for entry in batch:
+            logging.error("❌ Audit Entry Lost: %s", entry.row)
+        return False
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            ok = self._write(batch)
+            for entry in batch:
+                entry.finish(ok)
+            with self._condition:
+                self._done += len(batch)
+                if ok:
+                    self.written += len(batch)
+                else:
+                    self.failed += len(batch)
+                self._condition.notify_all()
+
+audit_writer = AuditWriter()
\ No newline at end of file
@@ -0,0 +1,299 @@
+import fnmatch
+import logging
+import numpy as np
+from sqlalchemy.orm import Session
+from app.cogs.alerts.models import AlertRule
+from app.configurations.config import ALERT_FOR, ALERT_HYSTERESIS, ALERT_COOLDOWN
+
+METRICS = {"node": ("cpu", "ram", "disk"), "guest": ("cpu", "ram", "disk"), "storage": ("disk",)}
+
+# "field:pattern" terms of a selector; a bare pattern matches the name
+SELECTOR_FIELDS = ("name", "node", "cluster", "type", "vmid", "tag")
+LABEL_FIELDS = ("name", "node", "cluster", "type", "vmid")
+
+# ה-thresholds הישנים ב-SystemSettings הופכים לחוקי ברירת מחדל ל-nodes, שכל חוק אחר דורס
+DEFAULT_RULE_PRIORITY = -1
+DEFAULT_THRESHOLDS = {"cpu": 90, "ram": 90, "disk": 85}
+
+def parse_selector(selector: str | None) -> tuple:
+    terms = []
+    for term in (selector or "").split():
+        field, separator, pattern = term.partition(":")
+        if not separator:
+            field, pattern = "name", term
+        if field not in SELECTOR_FIELDS or not pattern:
+            raise ValueError(f"Invalid selector term: {term}")
+        terms.append((field, pattern.lower()))
+    return tuple(terms)
+
+class Rule:
+    # Detached copy of an alert rule, with its selector already parsed
+    def __init__(self, id, name: str, kind: str, metric: str, threshold: float | None,
+                 selector: str | None = None, priority: int = 0,
+                 for_seconds: int | None = None, hysteresis: float | None = None, cooldown: int | None = None):
+        if metric not in METRICS.get(kind, ()):
+            raise ValueError(f"Metric {metric} is not available for {kind}")
+        self.id = id
+        self.name = name
+        self.kind = kind
+        self.metric = metric
+        self.threshold = threshold
+        self.selector = selector
+        self.priority = priority
+        self.for_seconds = ALERT_FOR if for_seconds is None else for_seconds
+        self.hysteresis = ALERT_HYSTERESIS if hysteresis is None else hysteresis
+        self.cooldown = ALERT_COOLDOWN if cooldown is None else cooldown
+        self.terms = parse_selector(selector)
+
+    @property
+    def order(self) -> tuple:
+        # Rules are applied in this order, so higher priority and then more specific selectors win
+        return (self.priority, len(self.terms), self.id or 0)
+
+class Breach:
+    def __init__(self, rule: Rule, cluster: str, node: str, key: str, label: str, value: float, threshold: float):
+        self.rule = rule
+        self.kind = rule.kind
+        self.metric = rule.metric
+        self.cluster = cluster
+        self.node = node  # label of the node the resource is on
+        self.key = key  # <cluster>/pve1, <cluster>/101, <cluster>/pve1/local-lvm
+        self.label = label
+        self.value = value
+        self.threshold = threshold
+
+class ResourceFrame:
+    # All resources of one kind as columns: label columns for the selectors and one
+    # float array per metric (percent, NaN when unknown). Selector masks are computed
+    # once per frame and shared by every rule that uses the same selector.
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.keys = []
+        self.index = {}  # key -> row
+        self.clusters = []
+        self.nodes = []
+        self.refs = []  # (node name, storage id / (guest type, vmid)) for polling a single resource
+        self.labels = []
+        self.columns = {field: [] for field in LABEL_FIELDS}
+        self.values = {metric: [] for metric in METRICS[kind]}
+        self.tags = {}  # tag -> row indexes
+        self._uniques = {}
+        self._masks = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, cluster: str, node: str, key: str, label: str, ref: tuple, columns: dict, values: dict, tags=()):
+        row = len(self.keys)
+        self.keys.append(key)
+        self.index[key] = row
+        self.clusters.append(cluster)
+        self.nodes.append(node)
+        self.refs.append(ref)
+        self.labels.append(label)
+        for field in LABEL_FIELDS:
+            self.columns[field].append(str(columns.get(field, "")).lower())
+        for metric in self.values:
+            self.values[metric].append(values.get(metric, np.nan))
+        for tag in tags:
+            self.tags.setdefault(tag.lower(), []).append(row)
+
+    def freeze(self):
+        self.columns = {field: np.array(column, dtype=object) for field, column in self.columns.items()}
+        self.values = {metric: np.array(column, dtype=float) for metric, column in self.values.items()}
+        self.tags = {tag: np.array(rows, dtype=int) for tag, rows in self.tags.items()}
+        return self
+
+    def _term_mask(self, field: str, pattern: str) -> np.ndarray:
+        mask = np.zeros(len(self), dtype=bool)
+        if field == "tag":
+            for tag in fnmatch.filter(self.tags, pattern):
+                mask[self.tags[tag]] = True
+            return mask
+
+        # fnmatch runs once per distinct value, not once per resource
+        if field not in self._uniques:
+            self._uniques[field] = np.unique(self.columns[field], return_inverse=True)
+        uniques, inverse = self._uniques[field]
+        matched = np.array([fnmatch.fnmatchcase(value, pattern) for value in uniques], dtype=bool)
+        return matched[inverse] if len(matched) else mask
+
+    def mask(self, terms: tuple) -> np.ndarray:
+        mask = self._masks.get(terms)
+        if mask is None:
+            mask = np.ones(len(self), dtype=bool)
+            for field, pattern in terms:
+                mask &= self._term_mask(field, pattern)
+            self._masks[terms] = mask
+        return mask
+
+    def value(self, key: str, metric: str) -> float | None:
+        row = self.index.get(key)
+        if row is None or np.isnan(self.values[metric][row]):
+            return None
+        return float(self.values[metric][row])
+
+def _percent(used, total) -> float:
+    return used / total * 100 if total else np.nan
+
+def build_frames(snapshots: list, qualify_nodes: bool = False) -> dict:
+    # snapshots: [(cluster name, raw snapshot)]
+    frames = {kind: ResourceFrame(kind) for kind in METRICS}
+    for cluster, data in snapshots:
+        shared_label = cluster if qualify_nodes else "shared"
+        seen_shared = set()
+        for node in data:
+            if node.get("state") == "unreachable":
+                continue
+            node_name = node["node"]
+            node_label = f"{cluster}/{node_name}" if qualify_nodes else node_name
+            frames["node"].add(
+                cluster, node_label, f"{cluster}/{node_name}", node_label, (node_name, None),
+                {"name": node_name, "node": node_name, "cluster": cluster, "type": "node"},
+                {
+                    "cpu": node["cpu"] * 100,
+                    "ram": _percent(node["mem"], node["maxmem"]),
+                    "disk": _percent(node["disk_used"], node["disk_total"]),
+                },
+            )
+
+            for storage in node.get("storages", []):
+                if not storage["shared"]:
+                    frames["storage"].add(
+                        cluster, node_label, f"{cluster}/{node_name}/{storage['storage']}", f"{storage['storage']}@{node_label}",
+                        (node_name, storage["storage"]),
+                        {"name": storage["storage"], "node": node_name, "cluster": cluster, "type": "local"},
+                        {"disk": _percent(storage["used"], storage["total"])},
+                    )
+                elif storage["storage"] not in seen_shared:
+                    # storage משותף הוא משאב אחד של הקלאסטר, לא אחד לכל node
+                    seen_shared.add(storage["storage"])
+                    frames["storage"].add(
+                        cluster, shared_label, f"{cluster}/{storage['storage']}", f"{storage['storage']}@{shared_label}",
+                        (node_name, storage["storage"]),
+                        {"name": storage["storage"], "node": "shared", "cluster": cluster, "type": "shared"},
+                        {"disk": _percent(storage["used"], storage["total"])},
+                    )
+
+            for guest in node["guests"]:
+                if guest["status"] != "running" or "cpu" not in guest:
+                    continue
+                frames["guest"].add(
+                    cluster, node_label, f"{cluster}/{guest['vmid']}", f"{guest['name']} ({guest['vmid']})@{node_label}",
+                    (node_name, (guest["type"], guest["vmid"])),
+                    {"name": guest["name"], "node": node_name, "cluster": cluster,
+                     "type": guest["type"], "vmid": guest["vmid"]},
+                    {
+                        "cpu": guest["cpu"] * 100,
+                        "ram": _percent(guest["mem"], guest["maxmem"]),
+                        "disk": _percent(guest["disk"], guest["maxdisk"]),
+                    },
+                    guest.get("tags", ()),
+                )
+    return {kind: frame.freeze() for kind, frame in frames.items()}
+
+def unreachable_nodes(snapshots: list, qualify_nodes: bool = False) -> set:
+    # (cluster, node label) of nodes with no data this cycle – their alerts are left as they are
+    return {
+        (cluster, f"{cluster}/{node['node']}" if qualify_nodes else node["node"])
+        for cluster, data in snapshots for node in data if node.get("state") == "unreachable"
+    }
+
+def _group_rules(rules: list) -> dict:
+    grouped = {}
+    for rule in sorted(rules, key=lambda rule: rule.order):
+        grouped.setdefault((rule.kind, rule.metric), []).append(rule)
+    return grouped
+
+def _rule_arrays(frame: ResourceFrame, kind_rules: list):
+    # Every matching rule writes its threshold into one array, in priority order
+    thresholds = np.full(len(frame), np.nan)
+    hysteresis = np.zeros(len(frame))
+    owners = np.full(len(frame), -1)
+    for index, rule in enumerate(kind_rules):
+        mask = frame.mask(rule.terms)
+        thresholds[mask] = np.nan if rule.threshold is None else rule.threshold
+        hysteresis[mask] = rule.hysteresis
+        owners[mask] = index
+    return thresholds, hysteresis, owners
+
+def evaluate(frames: dict, rules: list, active=()) -> list:
+    # Per (kind, metric) one threshold array and a single comparison finds all
+    # breaches at once. Alerts in `active` ((kind, key, metric) already firing)
+    # only clear once they drop below threshold - hysteresis.
+    active_rows = {}
+    for kind, key, metric in active:
+        frame = frames.get(kind)
+        if frame is not None and key in frame.index:
+            active_rows.setdefault((kind, metric), []).append(frame.index[key])
+
+    breaches = []
+    for (kind, metric), kind_rules in _group_rules(rules).items():
+        frame = frames.get(kind)
+        if frame is None or not len(frame):
+            continue
+
+        thresholds, hysteresis, owners = _rule_arrays(frame, kind_rules)
+        effective = thresholds.copy()
+        rows = active_rows.get((kind, metric))
+        if rows:
+            effective[rows] -= hysteresis[rows]
+
+        values = frame.values[metric]
+        for row in np.flatnonzero(values > effective):
+            breaches.append(Breach(
+                kind_rules[owners[row]], frame.clusters[row], frame.nodes[row], frame.keys[row], frame.labels[row],
+                float(values[row]), float(thresholds[row]),
+            ))
+    return breaches
+
+def headroom(frames: dict, rules: list) -> dict:
+    # kind -> per-resource distance (percent points) to the closest threshold, inf when no rule applies
+    result = {kind: np.full(len(frame), np.inf) for kind, frame in frames.items()}
+    for (kind, metric), kind_rules in _group_rules(rules).items():
+        frame = frames.get(kind)
+        if frame is None or not len(frame):
+            continue
+        thresholds, _, _ = _rule_arrays(frame, kind_rules)
+        distance = thresholds - frame.values[metric]
+        result[kind] = np.fmin(result[kind], np.where(np.isnan(distance), np.inf, distance))
+    return result
+
+def default_rules(settings, alert_settings) -> list:
+    if alert_settings is None:
+        return []
+    rules = []
+    for metric, default in DEFAULT_THRESHOLDS.items():
+        if getattr(alert_settings, f"{metric}_alert"):
+            threshold = getattr(settings, f"{metric}_threshold") or default
+            rules.append(Rule(None, f"default {metric}", "node", metric, threshold, priority=DEFAULT_RULE_PRIORITY))
+    return rules
+
+def load_rules(db: Session, settings, alert_settings) -> list:
+    rules = default_rules(settings, alert_settings)
+    for row in db.query(AlertRule).filter(AlertRule.enabled == True):
+        try:
+            rules.append(Rule(
+                row.id, row.name, row.kind, row.metric, row.threshold, row.selector, row.priority or 0,
+                row.for_seconds, row.hysteresis, row.cooldown,
+            ))
+        except ValueError as e:
+            logging.error("❌ Skipping Alert Rule %s: %s", row.name, e)
+    return rules
+
+def format_alert(breach: Breach) -> str:
+    if breach.kind == "node":
+        if breach.metric == "disk":
+            return f"⚠️ {breach.value:.1f}% :אחוזים ,{breach.label} :שטח דיסק כמעט מלא בשרת"
+        return f"⚠️ {breach.value:.1f}% :אחוזים ,{breach.label} :בשרת {breach.metric.upper()}-שימוש גבוה ב"
+    if breach.kind == "storage":
+        return f"⚠️ {breach.value:.1f}% :אחוזים ,{breach.label} :כמעט מלא storage"
+    if breach.metric == "disk":
+        return f"⚠️ {breach.value:.1f}% :אחוזים ,{breach.label} :שטח דיסק כמעט מלא במכונה"
+    return f"⚠️ {breach.value:.1f}% :אחוזים ,{breach.label} :במכונה {breach.metric.upper()}-שימוש גבוה ב"
+
+def format_resolved(kind: str, metric: str, label: str, value: float | None) -> str:
+    target = "storage" if kind == "storage" else metric.upper()
+    if value is None:
+        return f"✅ {label} :חזר לתקין {target}"
+    return f"✅ {value:.1f}% :אחוזים ,{label} :חזר לתקין {target}"
@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, UniqueConstraint
+from app.cogs.database import Base
+
+class AlertRule(Base):
+    __tablename__ = "alert_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+
+    kind = Column(String, nullable=False)  # node / guest / storage
+    metric = Column(String, nullable=False)  # cpu / ram / disk
+    threshold = Column(Float, nullable=True)  # percent; NULL silences the matched resources
+    selector = Column(String, nullable=True)  # "web-*", "tag:prod node:pve1" ... NULL = everything
+
+    priority = Column(Integer, default=0)  # higher wins when several rules match a resource
+    enabled = Column(Boolean, default=True)
+
+    # NULL = the ALERT_* defaults from config
+    for_seconds = Column(Integer, nullable=True)
+    hysteresis = Column(Float, nullable=True)
+    cooldown = Column(Integer, nullable=True)
+
+class AlertState(Base):
+    # One row per (resource, metric) that ever breached: pending -> firing -> resolved
+    __tablename__ = "alert_states"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    resource = Column(String, nullable=False)  # same keys as the metrics history
+    metric = Column(String, nullable=False)
+    cluster = Column(String, nullable=False)
+    node = Column(String, nullable=True)  # label of the node the resource is on
+
+    label = Column(String, nullable=False)
+    rule_name = Column(String, nullable=True)
+    state = Column(String, nullable=False)
+    value = Column(Float, nullable=True)
+    threshold = Column(Float, nullable=True)
+
+    # epoch seconds
+    started_at = Column(Integer, nullable=False)
+    fired_at = Column(Integer, nullable=True)
+    notified_at = Column(Integer, nullable=True)
+    resolved_at = Column(Integer, nullable=True)
+
+    __table_args__ = (UniqueConstraint("kind", "resource", "metric", name="uq_alert_state"),)
@@ -0,0 +1,110 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cogs.get_db import get_async_db
+from app.cogs import models
+from app.cogs.alerts import models as alert_models
+from app.cogs.alerts import schemas as alert_schemas
+from app.cogs.alerts.engine import Rule
+from app.cogs.admin_panel.admin_guard import require_admin
+from app.cogs.admin_panel import audit_logger
+
+router = APIRouter(prefix="/alert-rules", tags=["Alert Rules"])
+
+def _validate(data: alert_schemas.AlertRuleBase):
+    try:
+        Rule(None, data.name, data.kind, data.metric, data.threshold, data.selector, data.priority)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/", response_model=List[alert_schemas.AlertRuleResponse])
+async def list_alert_rules(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(require_admin)
+):
+    result = await db.scalars(select(alert_models.AlertRule).order_by(alert_models.AlertRule.id))
+    return result.all()
+
+@router.get("/states", response_model=List[alert_schemas.AlertStateResponse])
+async def list_alert_states(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(require_admin)
+):
+    # Pending and firing alerts
+    result = await db.scalars(
+        select(alert_models.AlertState)
+        .where(alert_models.AlertState.state != "resolved")
+        .order_by(alert_models.AlertState.started_at)
+    )
+    return result.all()
+
+@router.post("/", response_model=alert_schemas.AlertRuleResponse)
+async def create_alert_rule(
+    data: alert_schemas.AlertRuleBase,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(require_admin)
+):
+    _validate(data)
+    rule = alert_models.AlertRule(**data.model_dump())
+    db.add(rule)
+    await db.commit()
+    await db.refresh(rule)
+
+    await audit_logger.log_action_async(
+        db=db,
+        action="הוספת חוק התראה",
+        performed_by=current_user.email,
+        details=f"{rule.name}: {rule.kind} {rule.metric} > {rule.threshold} ({rule.selector or '*'})"
+    )
+
+    return rule
+
+@router.put("/{rule_id}", response_model=alert_schemas.AlertRuleResponse)
+async def update_alert_rule(
+    rule_id: int,
+    data: alert_schemas.AlertRuleBase,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(require_admin)
+):
+    rule = await db.scalar(select(alert_models.AlertRule).filter_by(id=rule_id))
+    if not rule:
+        raise HTTPException(status_code=404, detail="חוק ההתראה לא נמצא")
+
+    _validate(data)
+    for field, value in data.model_dump().items():
+        setattr(rule, field, value)
+
+    await db.commit()
+    await db.refresh(rule)
+
+    await audit_logger.log_action_async(
+        db=db,
+        action="עדכון חוק התראה",
+        performed_by=current_user.email,
+        details=f"{rule.name}: {rule.kind} {rule.metric} > {rule.threshold} ({rule.selector or '*'})"
+    )
+
+    return rule
+
+@router.delete("/{rule_id}")
+async def delete_alert_rule(
+    rule_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(require_admin)
+):
+    rule = await db.scalar(select(alert_models.AlertRule).filter_by(id=rule_id))
+    if not rule:
+        raise HTTPException(status_code=404, detail="חוק ההתראה לא נמצא")
+
+    await db.delete(rule)
+    await db.commit()
+
+    await audit_logger.log_action_async(
+        db=db,
+        action="מחיקת חוק התראה",
+        performed_by=current_user.email,
+        details=f"{rule.name}"
+    )
+
+    return {"message": "חוק ההתראה נמחק בהצלחה"}
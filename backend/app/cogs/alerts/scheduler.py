@@ -0,0 +1,130 @@
+import math
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from app.cogs.dashboard.collector import poll_resource, apply_poll
+from app.cogs.notifications.channels import TokenBucket
+from app.configurations.config import (
+    ALERTS_CHECK_TIME, PROXMOX_MAX_WORKERS, SCHEDULER_MIN_INTERVAL, SCHEDULER_BACKOFF,
+    SCHEDULER_NEAR_THRESHOLD, SCHEDULER_FAST_CHANGE, SCHEDULER_JITTER, SCHEDULER_MAX_RPS
+)
+
+def _jitter(interval: float) -> float:
+    return interval * random.uniform(1 - SCHEDULER_JITTER, 1 + SCHEDULER_JITTER)
+
+class ResourceSchedule:
+    def __init__(self, kind: str, cluster: str, key: str, ref: tuple):
+        self.kind = kind
+        self.cluster = cluster
+        self.key = key
+        self.ref = ref  # (node name, storage id / (guest type, vmid))
+        self.interval = ALERTS_CHECK_TIME
+        self.next_due = 0.0
+        self.values = None
+        self.seen_at = None
+
+    @property
+    def hot(self) -> bool:
+        # Calm resources are covered by the full scrapes alone
+        return self.interval < ALERTS_CHECK_TIME
+
+class PollScheduler:
+    # Next-due time per resource: hot resources are polled individually on a short
+    # interval that doubles on every calm poll, everything else waits for the next
+    # full scrape of its cluster. Single-resource requests share one rate cap.
+    def __init__(self):
+        self.resources: dict = {}  # (kind, key) -> ResourceSchedule
+        self.full_due: dict = {}  # cluster -> next full scrape
+        self.bucket = TokenBucket(SCHEDULER_MAX_RPS, SCHEDULER_MAX_RPS)
+
+    def full_scrape_due(self, cluster: str, now: float) -> bool:
+        return now >= self.full_due.get(cluster, 0)
+
+    def scraped(self, cluster: str, now: float, interval: float = ALERTS_CHECK_TIME, ok: bool = True):
+        # `interval` is the cluster's own scrape interval
+        self.full_due[cluster] = now + _jitter(interval if ok else SCHEDULER_MIN_INTERVAL)
+        if not ok:
+            # No data to patch until the cluster scrapes again – its hot resources wait for that
+            for schedule in self.resources.values():
+                if schedule.cluster == cluster:
+                    schedule.next_due = max(schedule.next_due, self.full_due[cluster])
+
+    def forget(self, cluster: str):
+        self.full_due.pop(cluster, None)
+        for key in [key for key, schedule in self.resources.items() if schedule.cluster == cluster]:
+            del self.resources[key]
+
+    def observe(self, frames: dict, headroom: dict, now: float, clusters=(), polled=()):
+        # Reschedules everything seen this tick: all resources of fully scraped clusters,
+        # plus the resources polled on their own
+        for kind, frame in frames.items():
+            metrics = list(frame.values)
+            for row, key in enumerate(frame.keys):
+                if frame.clusters[row] not in clusters and (kind, key) not in polled:
+                    continue
+
+                schedule = self.resources.get((kind, key))
+                if schedule is None:
+                    schedule = self.resources[(kind, key)] = ResourceSchedule(kind, frame.clusters[row], key, frame.refs[row])
+
+                values = [float(frame.values[metric][row]) for metric in metrics]
+                hot = headroom[kind][row] < SCHEDULER_NEAR_THRESHOLD
+                if schedule.values is not None and now > schedule.seen_at:
+                    change = max(
+                        (abs(new - old) for new, old in zip(values, schedule.values) if not (math.isnan(new) or math.isnan(old))),
+                        default=0.0,
+                    )
+                    hot = hot or change / (now - schedule.seen_at) * 60 >= SCHEDULER_FAST_CHANGE
+
+                schedule.interval = SCHEDULER_MIN_INTERVAL if hot else min(ALERTS_CHECK_TIME, schedule.interval * SCHEDULER_BACKOFF)
+                schedule.next_due = now + _jitter(schedule.interval)
+                schedule.values, schedule.seen_at = values, now
+
+        # Resources that are gone from a cluster we just scraped in full, and polled ones
+        # that dropped out of the frames (a guest that came back stopped) – otherwise they
+        # would stay due and be polled again on every tick
+        seen = {(kind, key) for kind, frame in frames.items() for key in frame.keys}
+        for key in [key for key, schedule in self.resources.items() if (schedule.cluster in clusters or key in polled) and key not in seen]:
+            del self.resources[key]
+
+    def due(self, now: float) -> list:
+        return sorted(
+            (schedule for schedule in self.resources.values() if schedule.hot and schedule.next_due <= now),
+            key=lambda schedule: schedule.next_due,
+        )
+
+    def next_wakeup(self, now: float) -> float:
+        times = list(self.full_due.values()) + [schedule.next_due for schedule in self.resources.values() if schedule.hot]
+        return min(times, default=now + ALERTS_CHECK_TIME)
+
+    def poll(self, schedules: list, clients: dict, latest: dict, now: float) -> set:
+        # Polls as many due resources as the rate cap allows and patches them into
+        # `latest` (cluster -> raw snapshot); the rest stay due for the next tick
+        jobs = []
+        for schedule in schedules:
+            if schedule.cluster not in latest:
+                schedule.next_due = max(now + SCHEDULER_MIN_INTERVAL, self.full_due.get(schedule.cluster, 0))
+                continue
+            cost = 2 if schedule.kind == "node" else 1  # node = status + storage list
+            if self.bucket.reserve(cost) > 0:
+                break
+            jobs.append(schedule)
+        if not jobs:
+            return set()
+
+        polled = set()
+        with ThreadPoolExecutor(max_workers=min(PROXMOX_MAX_WORKERS, len(jobs))) as pool:
+            futures = [
+                (schedule, pool.submit(poll_resource, clients[schedule.cluster], schedule.kind, schedule.ref[0], schedule.ref[1]))
+                for schedule in jobs
+            ]
+            for schedule, future in futures:
+                try:
+                    values = future.result()
+                except Exception as e:
+                    logging.error("❌ Error Polling %s: %s", schedule.key, e)
+                    schedule.next_due = now + _jitter(SCHEDULER_MIN_INTERVAL)
+                    continue
+                apply_poll(latest[schedule.cluster], schedule.kind, schedule.ref[0], schedule.ref[1], values)
+                polled.add((schedule.kind, schedule.key))
+        return polled
@@ -0,0 +1,39 @@
+from pydantic import BaseModel
+from typing import Optional, Literal
+
+class AlertRuleBase(BaseModel):
+    name: str
+    kind: Literal["node", "guest", "storage"]
+    metric: Literal["cpu", "ram", "disk"]
+    threshold: Optional[float] = None
+    selector: Optional[str] = None
+    priority: int = 0
+    enabled: bool = True
+    for_seconds: Optional[int] = None
+    hysteresis: Optional[float] = None
+    cooldown: Optional[int] = None
+
+class AlertRuleResponse(AlertRuleBase):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+class AlertStateResponse(BaseModel):
+    kind: str
+    resource: str
+    metric: str
+    cluster: str
+    node: Optional[str] = None
+    label: str
+    rule_name: Optional[str] = None
+    state: str
+    value: Optional[float] = None
+    threshold: Optional[float] = None
+    started_at: int
+    fired_at: Optional[int] = None
+    notified_at: Optional[int] = None
+    resolved_at: Optional[int] = None
+
+    class Config:
+        from_attributes = True
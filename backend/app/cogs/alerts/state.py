@@ -0,0 +1,86 @@
+from sqlalchemy.orm import Session
+from app.cogs.alerts.models import AlertState
+from app.cogs.alerts.engine import format_alert, format_resolved
+
+PENDING = "pending"
+FIRING = "firing"
+RESOLVED = "resolved"
+REPEAT = "repeat"  # reminder for an alert that is still firing
+
+class AlertEvent:
+    # A state change worth notifying about
+    def __init__(self, status: str, kind: str, metric: str, node: str | None, label: str, value: float | None, text: str):
+        self.status = status
+        self.kind = kind
+        self.metric = metric
+        self.node = node
+        self.label = label
+        self.value = value
+        self.text = text
+
+def _breach_event(status: str, breach) -> AlertEvent:
+    return AlertEvent(status, breach.kind, breach.metric, breach.node, breach.label, breach.value, format_alert(breach))
+
+def firing_keys(db: Session) -> set:
+    # (kind, resource, metric) of every firing alert, for the hysteresis in evaluate()
+    return {
+        (kind, resource, metric)
+        for kind, resource, metric in db.query(AlertState.kind, AlertState.resource, AlertState.metric)
+        .filter(AlertState.state == FIRING)
+    }
+
+def update_states(db: Session, breaches: list, frames: dict, clusters: set, now: int, unreachable=()) -> list:
+    # Moves every alert one step through pending -> firing -> resolved and returns
+    # the events to send: first firing, repeats after the rule's cooldown, and resolves.
+    # Alerts of clusters that weren't collected this cycle, or of unreachable nodes, are left untouched.
+    states = {(state.kind, state.resource, state.metric): state for state in db.query(AlertState)}
+    events = []
+
+    breached = set()
+    for breach in breaches:
+        key = (breach.kind, breach.key, breach.metric)
+        breached.add(key)
+        rule = breach.rule
+
+        state = states.get(key)
+        if state is None:
+            state = AlertState(kind=breach.kind, resource=breach.key, metric=breach.metric, cluster=breach.cluster, state=RESOLVED)
+            db.add(state)
+        if state.state == RESOLVED:
+            state.state = PENDING
+            state.started_at = now
+            state.fired_at = None
+            state.notified_at = None
+            state.resolved_at = None
+
+        state.label = breach.label
+        state.node = breach.node
+        state.rule_name = rule.name
+        state.value = breach.value
+        state.threshold = breach.threshold
+
+        if state.state == PENDING and now - state.started_at >= rule.for_seconds:
+            state.state = FIRING
+            state.fired_at = now
+            state.notified_at = now
+            events.append(_breach_event(FIRING, breach))
+        elif state.state == FIRING and rule.cooldown and now - (state.notified_at or 0) >= rule.cooldown:
+            state.notified_at = now
+            events.append(_breach_event(REPEAT, breach))
+
+    for key, state in states.items():
+        if key in breached or state.state == RESOLVED or state.cluster not in clusters or (state.cluster, state.node) in unreachable:
+            continue
+        frame = frames.get(state.kind)
+        value = frame.value(state.resource, state.metric) if frame is not None else None
+        if state.state == FIRING:
+            events.append(AlertEvent(
+                RESOLVED, state.kind, state.metric, state.node, state.label, value,
+                format_resolved(state.kind, state.metric, state.label, value),
+            ))
+        state.state = RESOLVED
+        state.value = value
+        state.resolved_at = now
+
+    db.commit()
+    return events
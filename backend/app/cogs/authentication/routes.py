@@ -1,27 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.responses import RedirectResponse
-from app.cogs.get_db import get_db
+from app.cogs.get_db import get_async_db
 from app.cogs import models, auth
-from app.cogs.system_settings import models as settings_models
 from app.cogs.admin_panel import audit_logger  # זה הקובץ שמכיל את log_action
 from app.cogs.admin_panel.admin_guard import require_admin
+from app.cogs.lookup_cache import get_settings_async, invalidate_user
+from app.cogs.http_client import http_client
 from datetime import datetime
 from app.configurations.config import FULL_FRONEND_URL
-import requests
+import httpx
 import uuid
 
 router = APIRouter(tags=["SSO Login"])
 
 @router.get("/sso/login")
-def sso_login(db: Session = Depends(get_db)):
-    settings = db.query(settings_models.SystemSettings).first()
+async def sso_login():
+    settings = await get_settings_async()
 
     if not settings or not settings.oidc_discovery_url:
         return RedirectResponse(url=f"{FULL_FRONEND_URL}/login?error=sso_not_configured")
 
     try:
-        discovery = requests.get(settings.oidc_discovery_url, timeout=5)
+        discovery = await http_client().get(settings.oidc_discovery_url)
         discovery.raise_for_status()
         data = discovery.json()
         auth_url = data["authorization_endpoint"]
@@ -40,14 +42,14 @@ def sso_login(db: Session = Depends(get_db)):
     return RedirectResponse(url=redirect_url)
 
 @router.get("/auth/callback")
-def sso_callback(code: str, state: str, db: Session = Depends(get_db)):
-    settings = db.query(settings_models.SystemSettings).first()
+async def sso_callback(code: str, state: str, db: AsyncSession = Depends(get_async_db)):
+    settings = await get_settings_async()
     if not settings:
         raise HTTPException(status_code=500, detail="SSO settings not configured")
 
     # Fetch OIDC endpoints
     try:
-        discovery = requests.get(settings.oidc_discovery_url, timeout=5).json()
+        discovery = (await http_client().get(settings.oidc_discovery_url)).json()
         token_url = discovery["token_endpoint"]
         userinfo_url = discovery["userinfo_endpoint"]
     except Exception as e:
@@ -63,11 +65,11 @@ def sso_callback(code: str, state: str, db: Session = Depends(get_db)):
     }
 
     try:
-        token_resp = requests.post(token_url, data=data, headers={"Content-Type": "application/x-www-form-urlencoded"}, timeout=5)
+        token_resp = await http_client().post(token_url, data=data, headers={"Content-Type": "application/x-www-form-urlencoded"})
         token_resp.raise_for_status()
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print("❌ Token request failed")
-        if e.response is not None:
+        if isinstance(e, httpx.HTTPStatusError):
             print("🔍 Response content:", e.response.text)
         raise HTTPException(status_code=400, detail="Token exchange failed")
 
@@ -79,7 +81,7 @@ def sso_callback(code: str, state: str, db: Session = Depends(get_db)):
     # Get user info
     headers = {"Authorization": f"Bearer {access_token}"}
     try:
-        userinfo = requests.get(userinfo_url, headers=headers, timeout=5).json()
+        userinfo = (await http_client().get(userinfo_url, headers=headers)).json()
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch userinfo: {e}")
 
@@ -88,7 +90,7 @@ def sso_callback(code: str, state: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="User info missing email")
 
     # Check or create user
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await db.scalar(select(models.User).filter(models.User.email == email))
     is_new_user = False
 
     if not user:
@@ -99,16 +101,17 @@ def sso_callback(code: str, state: str, db: Session = Depends(get_db)):
             is_superadmin=False
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
         is_new_user = True
 
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
+    invalidate_user(user.email)
 
     # Log new user creation (with 'system' as the actor)
     if is_new_user:
-        audit_logger.log_action(
+        await audit_logger.log_action_async(
             db=db,
             action="SSO משתמש חדש נוצר באמצעות",
             performed_by=settings.oidc_name,
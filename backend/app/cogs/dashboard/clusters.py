@@ -0,0 +1,51 @@
+from app.cogs import database
+from app.cogs.lookup_cache import lookup_cache, get_settings
+from app.cogs.proxmox_client import retain_clients
+from app.cogs.system_settings import models as settings_models
+from app.configurations.config import SNAPSHOT_TTL
+
+# השם שמקבלות הגדרות ה־Proxmox הישנות (host יחיד ב־SystemSettings)
+DEFAULT_CLUSTER_NAME = "default"
+
+class ClusterConfig:
+    # Detached copy of a cluster's connection settings, safe to use after the session is closed
+    def __init__(self, name: str, host: str, token_id: str, token_secret: str, scrape_interval: int = SNAPSHOT_TTL):
+        self.name = name
+        self.host = host
+        self.token_id = token_id
+        self.token_secret = token_secret
+        self.scrape_interval = scrape_interval or SNAPSHOT_TTL
+
+def load_clusters() -> list:
+    # נקרא בכל בקשת dashboard ובכל מחזור ניטור – מה־cache, עד שהגדרות/קלאסטרים משתנים
+    return list(lookup_cache.get("clusters", _load_clusters))
+
+async def load_clusters_async() -> list:
+    return list(await lookup_cache.aget("clusters", _load_clusters))
+
+def _load_clusters() -> list:
+    db = database.SessionLocal()
+    try:
+        rows = (
+            db.query(settings_models.ProxmoxCluster)
+            .filter(settings_models.ProxmoxCluster.enabled == True)
+            .order_by(settings_models.ProxmoxCluster.id)
+            .all()
+        )
+    finally:
+        db.close()
+
+    clusters = [
+        ClusterConfig(row.name, row.host, row.token_id, row.token_secret, row.scrape_interval)
+        for row in rows
+    ]
+
+    settings = get_settings()
+    if settings and settings.proxmox_host and all(cluster.host != settings.proxmox_host for cluster in clusters):
+        clusters.insert(0, ClusterConfig(
+            DEFAULT_CLUSTER_NAME, settings.proxmox_host, settings.proxmox_token_id, settings.proxmox_token_secret
+        ))
+
+    # נטען מחדש אחרי כל שינוי הגדרות – זה המקום לסגור clients של חיבורים שכבר לא קיימים
+    retain_clients(clusters)
+    return clusters
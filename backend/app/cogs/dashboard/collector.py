@@ -0,0 +1,359 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.cogs.proxmox_client import ProxmoxClient
+from app.configurations.config import PROXMOX_MAX_WORKERS, PROXMOX_COLLECTION_MODE, COLLECTION_DEADLINE
+
+GB = 1024**3
+
+# שדות שימוש של guest רץ – אם /cluster/resources לא החזיר אחד מהם, נשלים מ־status/current
+GUEST_USAGE_FIELDS = ("cpu", "mem", "maxmem", "disk", "maxdisk")
+
+
+def _try_get(client: ProxmoxClient, path: str, deadline: float):
+    try:
+        return client.get(path, deadline=deadline)
+    except Exception:
+        return None
+
+def _wait(future, deadline: float):
+    return future.result(timeout=max(0.0, deadline - time.monotonic()))
+
+def collect_snapshot(client: ProxmoxClient, mode: str = PROXMOX_COLLECTION_MODE, max_workers: int = PROXMOX_MAX_WORKERS,
+                     previous=None, deadline: float | None = None):
+    # Raw cluster snapshot (bytes / fractions), shared by the dashboard and the alerts loop.
+    # Nodes that fail or miss the deadline are filled in from `previous` (the last
+    # CachedSnapshot) and marked stale, or marked unreachable when there is nothing to reuse.
+    # A guest whose own status call fails only has its usage filled in the same way.
+    deadline = time.monotonic() + COLLECTION_DEADLINE if deadline is None else deadline
+    if mode == "per_node":
+        nodes, failed = collect_per_node(client, max_workers, deadline)
+    else:
+        nodes, failed = collect_cluster_resources(client, max_workers, deadline)
+    return _fill_failed(nodes, failed, previous)
+
+def _fill_failed(nodes: list, failed: set, previous) -> list:
+    previous_nodes = {node["node"]: node for node in previous.data} if previous is not None else {}
+    result = []
+    for node in nodes:
+        old = previous_nodes.get(node["node"])
+        if node["node"] not in failed:
+            guests = [_fill_guest(guest, old, previous) if guest.get("state") == "stale" else guest for guest in node["guests"]]
+            result.append({**node, "guests": guests, "state": "online"})
+            continue
+        if old is not None and old.get("state") != "unreachable":
+            result.append({**old, "state": "stale", "stale_since": old.get("stale_since") or previous.collected_at})
+        else:
+            result.append({**node, "storages": [], "guests": [], "state": "unreachable"})
+    return result
+
+def _fill_guest(guest: dict, old_node: dict | None, previous) -> dict:
+    # The guest keeps its place in the fresh listing; usage comes from the previous
+    # snapshot when it has some, otherwise the guest is left without usage fields
+    if old_node is None or old_node.get("state") == "unreachable":
+        return guest
+    for old in old_node["guests"]:
+        if old["vmid"] == guest["vmid"] and old["type"] == guest["type"] and "cpu" in old:
+            usage = {field: old[field] for field in GUEST_USAGE_FIELDS}
+            return {**guest, **usage, "stale_since": old.get("stale_since") or previous.collected_at}
+    return guest
+
+def _node_info(node: dict) -> dict:
+    return {
+        "node": node["node"],
+        "cpu": node.get("cpu", 0),
+        "mem": node.get("mem", 0),
+        "maxmem": node.get("maxmem", 0),
+        "disk_used": 0,
+        "disk_total": 0,
+        "storages": [],
+        "guests": [],
+    }
+
+def _guest_info(guest: dict, guest_type: str, stats: dict | None = None) -> dict:
+    vm_id = guest["vmid"]
+    info = {
+        "vmid": vm_id,
+        "name": guest.get("name", f"VM-{vm_id}"),
+        "status": guest["status"],
+        "type": guest_type,
+        "tags": [tag for tag in (guest.get("tags") or "").split(";") if tag],
+    }
+    if stats is not None:
+        info.update({field: stats.get(field, 0) for field in GUEST_USAGE_FIELDS})
+    return info
+
+def collect_cluster_resources(client: ProxmoxClient, max_workers: int = PROXMOX_MAX_WORKERS, deadline: float | None = None):
+    # Node, guest and storage usage from a single /cluster/resources call.
+    # Returns (nodes, names of nodes that are offline or didn't answer in time).
+    deadline = time.monotonic() + COLLECTION_DEADLINE if deadline is None else deadline
+    resources = client.get("/cluster/resources", deadline=deadline)
+
+    nodes = {}
+    failed = set()
+    for item in resources:
+        if item.get("type") == "node":
+            nodes[item["node"]] = _node_info(item)
+            if item.get("status", "online") != "online":
+                failed.add(item["node"])
+
+    guests = {"qemu": [], "lxc": []}
+    for item in resources:
+        item_type = item.get("type")
+        node = nodes.get(item.get("node"))
+        if node is None:
+            continue
+        if item_type == "storage":
+            if item.get("status", "available") == "available":
+                node["storages"].append({
+                    "storage": item["storage"],
+                    "used": item.get("disk", 0),
+                    "total": item.get("maxdisk", 0),
+                    "shared": bool(item.get("shared")),
+                })
+                # storage משותף נספר פעם אחת ברמת הקלאסטר, לא בכל node
+                if not item.get("shared"):
+                    node["disk_used"] += item.get("disk", 0)
+                    node["disk_total"] += item.get("maxdisk", 0)
+        elif item_type in guests:
+            guests[item_type].append((node, item))
+
+    missing = []
+    for guest_type in ("qemu", "lxc"):
+        for node, item in guests[guest_type]:
+            if item["status"] != "running":
+                node["guests"].append(_guest_info(item, guest_type))
+            elif all(field in item for field in GUEST_USAGE_FIELDS):
+                node["guests"].append(_guest_info(item, guest_type, item))
+            else:
+                info = _guest_info(item, guest_type)
+                node["guests"].append(info)
+                if node["node"] not in failed:
+                    missing.append((node, info, item, f"/nodes/{node['node']}/{guest_type}/{item['vmid']}/status/current"))
+
+    if missing:
+        # The pool isn't waited on: calls still running at the deadline are abandoned
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = [(node, info, item, pool.submit(client.get, path, deadline=deadline)) for node, info, item, path in missing]
+            for node, info, item, future in futures:
+                try:
+                    stats = {**_wait(future, deadline), **{k: item[k] for k in GUEST_USAGE_FIELDS if k in item}}
+                except Exception:
+                    info["state"] = "stale"  # רק ה־guest הזה, לא כל ה־node
+                    continue
+                info.update({field: stats.get(field, 0) for field in GUEST_USAGE_FIELDS})
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    return list(nodes.values()), failed
+
+def collect_per_node(client: ProxmoxClient, max_workers: int = PROXMOX_MAX_WORKERS, deadline: float | None = None):
+    # The calls are issued in waves so that wall-clock time follows the slowest
+    # call of each wave, not the number of calls. A node whose calls fail or miss
+    # the deadline is returned in the failed set instead of failing the collection.
+    deadline = time.monotonic() + COLLECTION_DEADLINE if deadline is None else deadline
+    nodes = client.get("/nodes", deadline=deadline)
+    failed = {node["node"] for node in nodes if node.get("status", "online") != "online"}
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        # גל 1: רשימת storages, VM ו־CT לכל node במקביל
+        listings = []
+        for node in nodes:
+            node_name = node["node"]
+            if node_name in failed:
+                continue
+            listings.append((
+                node,
+                pool.submit(_try_get, client, f"/nodes/{node_name}/storage", deadline),
+                pool.submit(client.get, f"/nodes/{node_name}/qemu", deadline=deadline),
+                pool.submit(client.get, f"/nodes/{node_name}/lxc", deadline=deadline),
+            ))
+
+        # גל 2: סטטוס לכל storage ולכל guest רץ, בכל ה־nodes במקביל.
+        # storage משותף (Ceph/NFS/CIFS...) נשאל פעם אחת, דרך ה־node הראשון שמציג אותו
+        pending = []
+        shared_futures = {}
+        for node, storages_future, vms_future, cts_future in listings:
+            node_name = node["node"]
+            try:
+                storages = _wait(storages_future, deadline) or []
+                listed = [(guest_type, _wait(future, deadline)) for guest_type, future in (("qemu", vms_future), ("lxc", cts_future))]
+            except Exception:
+                failed.add(node_name)
+                continue
+
+            storage_futures = []
+            for storage in storages:
+                path = f"/nodes/{node_name}/storage/{storage['storage']}/status"
+                if not storage.get("shared"):
+                    storage_futures.append((storage, pool.submit(_try_get, client, path, deadline)))
+                    continue
+                if storage["storage"] not in shared_futures:
+                    shared_futures[storage["storage"]] = pool.submit(_try_get, client, path, deadline)
+                storage_futures.append((storage, shared_futures[storage["storage"]]))
+
+            guests = []
+            for guest_type, listing in listed:
+                for guest in listing:
+                    stats_future = None
+                    if guest["status"] == "running":
+                        stats_future = pool.submit(client.get, f"/nodes/{node_name}/{guest_type}/{guest['vmid']}/status/current", deadline=deadline)
+                    guests.append((guest, guest_type, stats_future))
+
+            pending.append((node, storage_futures, guests))
+
+        snapshot = {node["node"]: _node_info(node) for node in nodes}
+        for node, storage_futures, guests in pending:
+            info = snapshot[node["node"]]
+            try:
+                for storage, future in storage_futures:
+                    status_data = _wait(future, deadline)
+                    if status_data is None:
+                        continue  # יתכן ש־storage לא מחזיר סטטיסטיקות
+                    info["storages"].append({
+                        "storage": storage["storage"],
+                        "used": status_data.get("used", 0),
+                        "total": status_data.get("total", 0),
+                        "shared": bool(storage.get("shared")),
+                    })
+                    if not storage.get("shared"):
+                        info["disk_used"] += status_data.get("used", 0)
+                        info["disk_total"] += status_data.get("total", 0)
+
+                for guest, guest_type, stats_future in guests:
+                    try:
+                        stats = _wait(stats_future, deadline) if stats_future is not None else None
+                    except Exception:
+                        info["guests"].append({**_guest_info(guest, guest_type), "state": "stale"})
+                        continue
+                    info["guests"].append(_guest_info(guest, guest_type, stats))
+            except Exception:
+                failed.add(node["node"])
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return list(snapshot.values()), failed
+
+def poll_resource(client: ProxmoxClient, kind: str, node: str, ref) -> dict:
+    # Current usage of a single resource, in the fields of the raw snapshot
+    if kind == "node":
+        status = client.get(f"/nodes/{node}/status")
+        storages = [
+            storage for storage in client.get(f"/nodes/{node}/storage")
+            if storage.get("active", 1) and not storage.get("shared")
+        ]
+        return {
+            "cpu": status.get("cpu", 0),
+            "mem": status.get("memory", {}).get("used", 0),
+            "maxmem": status.get("memory", {}).get("total", 0),
+            "disk_used": sum(storage.get("used", 0) for storage in storages),
+            "disk_total": sum(storage.get("total", 0) for storage in storages),
+        }
+    if kind == "storage":
+        status = client.get(f"/nodes/{node}/storage/{ref}/status")
+        return {"used": status.get("used", 0), "total": status.get("total", 0)}
+
+    guest_type, vm_id = ref
+    stats = client.get(f"/nodes/{node}/{guest_type}/{vm_id}/status/current")
+    return {"status": stats.get("status", "unknown"), **{field: stats.get(field, 0) for field in GUEST_USAGE_FIELDS}}
+
+def apply_poll(snapshot: list, kind: str, node: str, ref, values: dict):
+    # Patches a poll_resource() result into a raw snapshot; a shared storage is
+    # patched on every node that lists it
+    for node_info in snapshot:
+        if kind == "storage":
+            for storage in node_info["storages"]:
+                if storage["storage"] == ref and (storage["shared"] or node_info["node"] == node):
+                    storage.update(values)
+            continue
+        if node_info["node"] != node:
+            continue
+        if kind == "node":
+            node_info.update(values)
+        else:
+            for guest in node_info["guests"]:
+                if guest["vmid"] == ref[1]:
+                    guest.update(values)
+                    guest.pop("state", None)  # fresh usage again
+                    guest.pop("stale_since", None)
+
+def shared_storages(snapshot: list) -> list:
+    # Each shared storage once, with the online nodes that see it
+    shared = {}
+    for node in snapshot:
+        if node.get("state", "online") != "online":
+            continue
+        for storage in node["storages"]:
+            if storage["shared"]:
+                entry = shared.setdefault(storage["storage"], {**storage, "nodes": []})
+                entry["nodes"].append(node["node"])
+    return list(shared.values())
+
+def storage_status(snapshot: list) -> list:
+    # Shared storages at cluster level, local storages per node (GB, like the dashboard)
+    clusters = {}
+    for node in snapshot:
+        cluster = clusters.setdefault(node.get("cluster"), {"cluster": node.get("cluster"), "shared": [], "local": [], "nodes": []})
+        cluster["nodes"].append(node)
+        for storage in node["storages"]:
+            if not storage["shared"]:
+                cluster["local"].append({
+                    "node": node["node"],
+                    "storage": storage["storage"],
+                    "used": round(storage["used"] / GB, 1),
+                    "total": round(storage["total"] / GB, 1),
+                })
+
+    for cluster in clusters.values():
+        cluster["shared"] = [
+            {
+                "storage": storage["storage"],
+                "used": round(storage["used"] / GB, 1),
+                "total": round(storage["total"] / GB, 1),
+                "nodes": storage["nodes"],
+            }
+            for storage in shared_storages(cluster.pop("nodes"))
+        ]
+    return list(clusters.values())
+
+def to_dashboard_status(snapshot: list) -> list:
+    result = []
+    for node in snapshot:
+        vms_info = []
+        for guest in node["guests"]:
+            if guest["status"] == "running" and "cpu" in guest:
+                vms_info.append({
+                    "vmid": guest["vmid"],
+                    "name": guest["name"],
+                    "status": guest["status"],
+                    "type": guest["type"],
+                    "cpu": guest["cpu"],
+                    "ram": {"used": round(guest["mem"] / GB, 1), "total": round(guest["maxmem"] / GB, 1)},
+                    "disk": {"used": round(guest["disk"] / GB, 1), "total": round(guest["maxdisk"] / GB, 1)}
+                })
+                if "stale_since" in guest:
+                    vms_info[-1]["stale_since"] = guest["stale_since"]
+            else:
+                vms_info.append({
+                    "vmid": guest["vmid"],
+                    "name": guest["name"],
+                    "status": guest["status"],
+                    "type": guest["type"]
+                })
+
+        entry = {
+            "cluster": node.get("cluster"),
+            "node": node["node"],
+            "state": node.get("state", "online"),
+            "stats": {
+                "cpu": round(node["cpu"] * 100, 1),
+                "ram": {"used": round(node["mem"] / GB, 1), "total": round(node["maxmem"] / GB, 1)},
+                "disk": {"used": round(node["disk_used"] / GB, 1), "total": round(node["disk_total"] / GB, 1)},
+            },
+            "vms": vms_info
+        }
+        if "stale_since" in node:
+            entry["stale_since"] = node["stale_since"]
+        result.append(entry)
+    return result
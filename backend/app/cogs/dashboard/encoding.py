@@ -0,0 +1,98 @@
+import gzip
+import hashlib
+import orjson
+from app.cogs.dashboard.collector import to_dashboard_status
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+COLUMNAR = "application/vnd.proxmon.columnar+json"
+MSGPACK = "application/msgpack"
+
+def to_columnar(status: list) -> dict:
+    # אותו מידע, עמודה לכל שדה במקום אובייקט לכל שורה – בלי מפתחות חוזרים
+    nodes = {"cluster": [], "node": [], "state": [], "cpu": [], "ram_used": [], "ram_total": [], "disk_used": [], "disk_total": []}
+    vms = {"cluster": [], "node": [], "vmid": [], "name": [], "status": [], "type": [], "cpu": [],
+           "ram_used": [], "ram_total": [], "disk_used": [], "disk_total": []}
+
+    for node in status:
+        stats = node["stats"]
+        nodes["cluster"].append(node["cluster"])
+        nodes["node"].append(node["node"])
+        nodes["state"].append(node["state"])
+        nodes["cpu"].append(stats["cpu"])
+        nodes["ram_used"].append(stats["ram"]["used"])
+        nodes["ram_total"].append(stats["ram"]["total"])
+        nodes["disk_used"].append(stats["disk"]["used"])
+        nodes["disk_total"].append(stats["disk"]["total"])
+
+        for vm in node["vms"]:
+            running = "ram" in vm
+            vms["cluster"].append(node["cluster"])
+            vms["node"].append(node["node"])
+            vms["vmid"].append(vm["vmid"])
+            vms["name"].append(vm["name"])
+            vms["status"].append(vm["status"])
+            vms["type"].append(vm["type"])
+            vms["cpu"].append(vm["cpu"] if running else None)
+            vms["ram_used"].append(vm["ram"]["used"] if running else None)
+            vms["ram_total"].append(vm["ram"]["total"] if running else None)
+            vms["disk_used"].append(vm["disk"]["used"] if running else None)
+            vms["disk_total"].append(vm["disk"]["total"] if running else None)
+
+    return {"nodes": nodes, "vms": vms}
+
+def negotiate_media_type(accept: str) -> str:
+    accept = (accept or "").lower()
+    if msgpack is not None and MSGPACK in accept:
+        return MSGPACK
+    if COLUMNAR in accept:
+        return COLUMNAR
+    return JSON
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    accepted = set()
+    for part in (accept_encoding or "").lower().split(","):
+        token, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(token)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def encode_snapshot(entry, media_type: str, encoding: str | None):
+    # Bodies are built once per (snapshot, representation) and reused by every request
+    key = (media_type, encoding)
+    cached = entry.encoded.get(key)
+    if cached is not None:
+        return cached
+
+    if encoding is None:
+        status = to_dashboard_status(entry.data)
+        if media_type == MSGPACK:
+            body = msgpack.packb(status)
+        elif media_type == COLUMNAR:
+            body = orjson.dumps(to_columnar(status))
+        else:
+            body = orjson.dumps(status)
+        etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    else:
+        body, etag = encode_snapshot(entry, media_type, None)
+        if encoding == "br":
+            body = brotli.compress(body, quality=5)
+        else:
+            body = gzip.compress(body, compresslevel=6)
+
+    entry.encoded[key] = (body, etag)
+    return body, etag
@@ -0,0 +1,106 @@
+import base64
+import json
+import threading
+from bisect import bisect_left, bisect_right
+from app.cogs.dashboard.collector import to_dashboard_status
+
+SORT_KEYS = ("name", "cpu", "ram", "disk")
+
+_build_lock = threading.Lock()
+
+def _usage(part: dict | None) -> float:
+    if not part or not part["total"]:
+        return -1.0
+    return part["used"] / part["total"]
+
+class GuestIndex:
+    # Guests of one snapshot, indexed once by cluster/node/type/status with
+    # presorted keys per sort field, so each query only touches its matches.
+    def __init__(self, status: list):
+        self.rows = []
+        self.by_field = {"cluster": {}, "node": {}, "type": {}, "status": {}}
+        for node in status:
+            for vm in node["vms"]:
+                row_id = len(self.rows)
+                self.rows.append({"cluster": node["cluster"], "node": node["node"], **vm})
+                for field in self.by_field:
+                    self.by_field[field].setdefault(self.rows[row_id][field], set()).add(row_id)
+
+        self.names = [row["name"].lower() for row in self.rows]
+        self.sorted_keys = {}
+        self.ranks = {}
+        for sort in SORT_KEYS:
+            keys = sorted(
+                (self._sort_value(row, sort), row["cluster"] or "", row["vmid"], row_id)
+                for row_id, row in enumerate(self.rows)
+            )
+            ranks = [0] * len(keys)
+            for position, key in enumerate(keys):
+                ranks[key[3]] = position
+            self.sorted_keys[sort] = keys
+            self.ranks[sort] = ranks
+
+    @staticmethod
+    def _sort_value(row: dict, sort: str):
+        if sort == "name":
+            return row["name"].lower()
+        if sort == "cpu":
+            return row.get("cpu", -1.0)
+        return _usage(row.get(sort))
+
+    def query(self, filters: dict, q: str | None, sort: str, descending: bool, limit: int, after: list | None):
+        candidates = None
+        for field, value in filters.items():
+            if value is None:
+                continue
+            matches = self.by_field[field].get(value, set())
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                break
+
+        keys = self.sorted_keys[sort]
+        if candidates is None and not q:
+            ordered = keys
+        else:
+            row_ids = range(len(self.rows)) if candidates is None else candidates
+            if q:
+                needle = q.lower()
+                row_ids = [row_id for row_id in row_ids if needle in self.names[row_id]]
+            ranks = self.ranks[sort]
+            ordered = [keys[position] for position in sorted(ranks[row_id] for row_id in row_ids)]
+        total = len(ordered)
+
+        if descending:
+            end = bisect_left(ordered, tuple(after)) if after else len(ordered)
+            page = ordered[max(0, end - limit):end][::-1]
+            has_more = end - limit > 0
+        else:
+            start = bisect_right(ordered, tuple(after) + (float("inf"),)) if after else 0
+            page = ordered[start:start + limit]
+            has_more = start + limit < len(ordered)
+
+        next_cursor = encode_cursor(sort, descending, page[-1][:3]) if page and has_more else None
+        return [self.rows[key[3]] for key in page], next_cursor, total
+
+def encode_cursor(sort: str, descending: bool, key: tuple) -> str:
+    # The cursor carries the sort it was issued for – a sort key only compares with its own kind
+    cursor = [sort, "desc" if descending else "asc", *key]
+    return base64.urlsafe_b64encode(json.dumps(cursor, separators=(",", ":")).encode()).decode()
+
+def decode_cursor(cursor: str, sort: str, descending: bool) -> list:
+    key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(key, list) or len(key) != 5 or key[:2] != [sort, "desc" if descending else "asc"]:
+        raise ValueError("invalid cursor")
+    value, cluster, vmid = key[2:]
+    value_type = str if sort == "name" else (int, float)
+    if not isinstance(value, value_type) or isinstance(value, bool) or not isinstance(cluster, str) or not isinstance(vmid, int):
+        raise ValueError("invalid cursor")
+    return key[2:]
+
+def guest_index(entry) -> GuestIndex:
+    # Built once per snapshot and reused until the cache refreshes
+    if entry.guest_index is None:
+        with _build_lock:
+            if entry.guest_index is None:
+                entry.guest_index = GuestIndex(to_dashboard_status(entry.data))
+    return entry.guest_index
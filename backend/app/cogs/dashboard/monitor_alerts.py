@@ -1,121 +1,118 @@
+import copy
 import time
 import threading
-import requests
 import logging
 from sqlalchemy.orm import Session
 from app.cogs.system_settings import models as settings_models
 from app.cogs.dashboard import schemas as dashboard_schemas
+from app.cogs.dashboard.clusters import load_clusters
+from app.cogs.lookup_cache import get_settings
+from app.cogs.dashboard.snapshot_cache import collect_clusters
+from app.cogs.metrics.store import maintain
+from app.cogs.alerts.engine import build_frames, evaluate, headroom, load_rules, unreachable_nodes
+from app.cogs.alerts.scheduler import PollScheduler
+from app.cogs.proxmox_client import get_client
+from app.cogs.alerts.state import firing_keys, update_states
+from app.cogs.notifications.dispatcher import notify
+from app.cogs.notifications.digest import Digest, render_digest
 from app.cogs.database import SessionLocal
-from app.configurations.config import ALERTS_CHECK_TIME
+from app.configurations.config import ALERTS_CHECK_TIME, ALERT_DIGEST, ALERT_DIGEST_WINDOW
 from colorama import Fore, Style
 
 logging.basicConfig(level=logging.INFO)
 
-def send_telegram(message: str, token: str, chat_id: str):
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload = {"chat_id": chat_id, "text": message}
-    try:
-        response = requests.post(url, json=payload, timeout=5)
-        response.raise_for_status()
-        logging.info("📩 Alert Sent To Telegram")
-    except Exception as e:
-        logging.error("❌ Error Sending Alert To Telegram: %s", e)
-
-def send_discord(message: str, bot_token: str, channel_id: str):
-    url = f"https://discord.com/api/v10/channels/{channel_id}/messages"
-    headers = {
-        "Authorization": f"Bot {bot_token}",
-        "Content-Type": "application/json"
-    }
-    payload = {"content": message}
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=5)
-        response.raise_for_status()
-        logging.info("📩 Alert Sent To Discord")
-    except Exception as e:
-        logging.error("❌ Error Sending Alert To Discord: %s", e)
+digest = Digest(ALERT_DIGEST_WINDOW)
 
 def monitor_loop():
+    scheduler = PollScheduler()
+    latest = {}  # cluster name -> raw snapshot (copy), patched by single-resource polls
+
     while True:
-        logging.info(f"{Fore.YELLOW} 🔄 Searching For Alerts... {Style.RESET_ALL}")
+        now = time.time()
         db: Session = SessionLocal()
         try:
-            settings = db.query(settings_models.SystemSettings).first()
+            clusters = load_clusters()
+            settings = get_settings() or settings_models.SystemSettings()
             alert_settings = db.query(dashboard_schemas.AlertSettings).first()
 
-            if not settings or not settings.proxmox_host:
+            if not clusters:
                 logging.warning("⚠️ Proxmox settings do not exist. Skip.")
                 time.sleep(ALERTS_CHECK_TIME)
                 continue
 
-            host = settings.proxmox_host.strip().replace("https://", "").replace("http://", "")
-            base_url = f"https://{host}/api2/json"
-            token = f"PVEAPIToken={settings.proxmox_token_id}={settings.proxmox_token_secret}"
-            headers = {"Authorization": token}
-
-            nodes_resp = requests.get(f"{base_url}/nodes", headers=headers, verify=False, timeout=5)
-            nodes_resp.raise_for_status()
-            nodes = nodes_resp.json().get("data", [])
-
-            for node in nodes:
-                node_name = node["node"]
-                cpu = node.get("cpu", 0)
-                mem = node.get("mem", 0)
-                maxmem = node.get("maxmem", 0)
-
-                disk_used_total = 0
-                disk_total_total = 0
-                try:
-                    storages_resp = requests.get(f"{base_url}/nodes/{node_name}/storage", headers=headers, verify=False, timeout=5)
-                    storages_resp.raise_for_status()
-                    storages = storages_resp.json().get("data", [])
-
-                    for storage in storages:
-                        storage_id = storage["storage"]
-                        try:
-                            status_resp = requests.get(
-                                f"{base_url}/nodes/{node_name}/storage/{storage_id}/status",
-                                headers=headers, verify=False, timeout=5
-                            )
-                            status_resp.raise_for_status()
-                            status_data = status_resp.json().get("data", {})
-                            disk_used_total += status_data.get("used", 0)
-                            disk_total_total += status_data.get("total", 0)
-                        except:
-                            continue
-                except:
-                    pass
-
-                logging.info(f"📊 Node {node_name} stats: CPU={cpu}, MEM={mem}/{maxmem}, DISK={disk_used_total}/{disk_total_total}")
-
-                alerts_to_send = []
-                cpu_threshold = (settings.cpu_threshold or 90) / 100.0
-                ram_threshold = (settings.ram_threshold or 90) / 100.0
-                disk_threshold = (settings.disk_threshold or 85) / 100.0
-
-                if alert_settings.cpu_alert and cpu > cpu_threshold:
-                    alerts_to_send.append(f"⚠️ {cpu*100:.1f}% :אחוזים ,{node_name} :בשרת CPU-שימוש גבוה ב")
-
-                if alert_settings.ram_alert and maxmem > 0 and (mem / maxmem) > ram_threshold:
-                    alerts_to_send.append(f"⚠️ {(mem / maxmem)*100:.1f}% :אחוזים ,{node_name} :בשרת RAM-שימוש גבוה ב")
-
-                if alert_settings.disk_alert and disk_total_total > 0 and (disk_used_total / disk_total_total) > disk_threshold:
-                    alerts_to_send.append(f"⚠️ {(disk_used_total / disk_total_total)*100:.1f}% :אחוזים ,{node_name} :שטח דיסק כמעט מלא בשרת")
-
-                for alert in alerts_to_send:
-                    logging.info(f"{Fore.RED} 🚨 Alert: {alert}{Style.RESET_ALL}")
-                    if settings.discord_enabled and settings.discord_bot_token and settings.discord_channel_id:
-                        send_discord(alert, settings.discord_bot_token, settings.discord_channel_id)
-                    if settings.telegram_enabled and settings.telegram_bot_token and settings.telegram_chat_id:
-                        send_telegram(alert, settings.telegram_bot_token, settings.telegram_chat_id)
-
-            logging.info(f"{Fore.GREEN} ✅ Alerts Checked. Wait for the next 10 minutes. {Style.RESET_ALL}")
+            names = {cluster.name for cluster in clusters}
+            for name in set(latest) - names:
+                latest.pop(name)
+                scheduler.forget(name)
+
+            # סריקה מלאה לכל קלאסטר שהגיע זמנו, במקביל; קלאסטר שנכשל לא עוצר את האחרים
+            full = [cluster for cluster in clusters if scheduler.full_scrape_due(cluster.name, now)]
+            scraped = set()
+            if full:
+                logging.info(f"{Fore.YELLOW} 🔄 Searching For Alerts... {Style.RESET_ALL}")
+            for cluster, snapshot in collect_clusters(full, allow_stale=False) if full else []:
+                if isinstance(snapshot, Exception):
+                    latest.pop(cluster.name, None)  # ההתראות שלו נשארות כמו שהן עד שיחזור
+                    scheduler.scraped(cluster.name, now, cluster.scrape_interval, ok=False)
+                    continue
+
+                for node in snapshot.data:
+                    logging.info(f"📊 Node {cluster.name}/{node['node']} stats: CPU={node['cpu']}, MEM={node['mem']}/{node['maxmem']}, DISK={node['disk_used']}/{node['disk_total']}")
+                latest[cluster.name] = copy.deepcopy(snapshot.data)
+                scheduler.scraped(cluster.name, now, cluster.scrape_interval)
+                scraped.add(cluster.name)
+
+            # הדגימות עצמן נרשמות בכל איסוף טרי (snapshot_cache), כאן רק rollup ו-retention
+            try:
+                maintain(db)
+            except Exception as e:
+                db.rollback()
+                logging.error("❌ Error Maintaining Metrics: %s", e)
+
+            # משאבים קרובים לסף או שמשתנים מהר נדגמים בנפרד, בין הסריקות המלאות
+            clients = {cluster.name: get_client(cluster.host, cluster.token_id, cluster.token_secret) for cluster in clusters}
+            polled = scheduler.poll(scheduler.due(now), clients, latest, now)
+
+            events = []
+            if scraped or polled:
+                # כל החוקים נבדקים במעבר אחד על כל המשאבים של כל הקלאסטרים,
+                # ורק מעברי מצב (firing / תזכורת / resolved) יוצאים כהודעה
+                rules = load_rules(db, settings, alert_settings)
+                snapshots = list(latest.items())
+                frames = build_frames(snapshots, qualify_nodes=len(clusters) > 1)
+                breaches = evaluate(frames, rules, active=firing_keys(db))
+                unreachable = unreachable_nodes(snapshots, qualify_nodes=len(clusters) > 1)
+                events = update_states(db, breaches, frames, set(latest), int(now), unreachable)
+                scheduler.observe(frames, headroom(frames, rules), now, clusters=scraped, polled=polled)
+                for event in events:
+                    logging.info(f"{Fore.RED} 🚨 Alert: {event.text}{Style.RESET_ALL}")
+
+            # נשלח ברקע, הלולאה לא מחכה ל-Telegram/Discord.
+            # ה־digest נבדק בכל סבב, גם בלי סריקה – חלון שנסגר יוצא בזמן
+            if ALERT_DIGEST:
+                digest.add(events, now)
+                pending = digest.take(now)
+                if len(pending) == 1:
+                    notify(settings, pending[0].text)
+                elif pending:
+                    notify(settings, render_digest(pending), preformatted=True)
+            else:
+                for event in events:
+                    notify(settings, event.text)
+
+            if scraped:
+                hot = sum(1 for schedule in scheduler.resources.values() if schedule.hot)
+                logging.info(f"{Fore.GREEN} ✅ Alerts Checked. {hot} resources on fast polling. {Style.RESET_ALL}")
         except Exception as e:
             logging.error(f"{Fore.RED} [ERROR] While testing: {e}{Style.RESET_ALL}")
         finally:
             db.close()
 
-        time.sleep(ALERTS_CHECK_TIME)  # Check every ALERTS_CHECK_TIME seconds
+        # עד המשאב הבא שמגיע זמנו (או עד שחלון ה־digest נסגר), לא יותר מ-ALERTS_CHECK_TIME
+        wakeup = scheduler.next_wakeup(time.time())
+        if ALERT_DIGEST and digest.closes_at() is not None:
+            wakeup = min(wakeup, digest.closes_at())
+        time.sleep(min(ALERTS_CHECK_TIME, max(1.0, wakeup - time.time())))
 
 def start_monitoring():
     threading.Thread(target=monitor_loop, daemon=True).start()
\ No newline at end of file
@@ -1,143 +1,163 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.cogs.get_db import get_db
-from app.cogs.system_settings import models as settings_models
+import time
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.cogs.get_db import get_async_db
+from app.cogs.database import SessionLocal
 from app.cogs.dashboard import schemas as dashboard_schemas
-import requests
+from app.cogs.dashboard.encoding import encode_snapshot, negotiate_encoding, negotiate_media_type
+from app.cogs.metrics.store import query_history
+from app.cogs.dashboard.clusters import load_clusters_async
+from app.cogs.dashboard.snapshot_cache import get_clusters_snapshot, snapshot_cache
+from app.cogs.dashboard.stream import status_stream
+from app.cogs.dashboard.inventory import guest_index, decode_cursor
+from app.cogs.dashboard.collector import storage_status
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
 @router.get("/proxmox-status")
-def get_proxmox_status(db: Session = Depends(get_db)):
-    settings = db.query(settings_models.SystemSettings).first()
-    if not settings or not settings.proxmox_host:
+async def get_proxmox_status(request: Request):
+    clusters = await load_clusters_async()
+    if not clusters:
         raise HTTPException(status_code=400, detail="Proxmox settings not configured")
 
-    host = settings.proxmox_host.strip().replace("https://", "").replace("http://", "")
-    base_url = f"https://{host}/api2/json"
-    token = f"PVEAPIToken={settings.proxmox_token_id}={settings.proxmox_token_secret}"
-    headers = {"Authorization": token}
+    try:
+        snapshot, errors = await run_in_threadpool(get_clusters_snapshot, clusters)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    media_type = negotiate_media_type(request.headers.get("accept"))
+    content_encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    body, etag = encode_snapshot(snapshot, media_type, content_encoding)
+
+    # מידע על טריות הנתונים
+    headers = {
+        "ETag": etag,
+        "Vary": "Accept, Accept-Encoding",
+        "Cache-Control": "no-cache",
+        "Age": str(int(snapshot.age)),
+        "X-Snapshot-Collected-At": f"{snapshot.collected_at:.3f}",
+        "X-Snapshot-Collection-Duration": f"{snapshot.duration:.3f}",
+    }
+    if errors:
+        headers["X-Unreachable-Clusters"] = ",".join(errors)
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match == "*" or etag.removeprefix("W/") in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    if content_encoding:
+        headers["Content-Encoding"] = content_encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+@router.get("/guests")
+async def list_guests(
+    cluster: str | None = None,
+    node: str | None = None,
+    type: Literal["qemu", "lxc"] | None = None,
+    status: str | None = None,
+    q: str | None = None,
+    sort: Literal["name", "cpu", "ram", "disk"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = None,
+):
+    clusters = await load_clusters_async()
+    if not clusters:
+        raise HTTPException(status_code=400, detail="Proxmox settings not configured")
 
     try:
-        nodes_resp = requests.get(f"{base_url}/nodes", headers=headers, verify=False, timeout=5)
-        nodes_resp.raise_for_status()
-        nodes = nodes_resp.json()["data"]
-
-        result = []
-
-        for node in nodes:
-            node_name = node["node"]
-
-            cpu_percent = round(node.get("cpu", 0) * 100, 1)
-            mem_used = round(node.get("mem", 0) / 1024**3, 1)
-            mem_total = round(node.get("maxmem", 0) / 1024**3, 1)
-
-            # איסוף סטטיסטיקות דיסק מכל ה־storages
-            disk_used_total = 0
-            disk_total_total = 0
-            try:
-                storages_resp = requests.get(f"{base_url}/nodes/{node_name}/storage", headers=headers, verify=False, timeout=5)
-                storages_resp.raise_for_status()
-                storages = storages_resp.json()["data"]
-
-                for storage in storages:
-                    storage_id = storage["storage"]
-                    try:
-                        status_resp = requests.get(
-                            f"{base_url}/nodes/{node_name}/storage/{storage_id}/status",
-                            headers=headers,
-                            verify=False,
-                            timeout=5
-                        )
-                        status_resp.raise_for_status()
-                        status_data = status_resp.json()["data"]
-                        disk_used_total += status_data.get("used", 0)
-                        disk_total_total += status_data.get("total", 0)
-                    except:
-                        continue  # יתכן ש־storage לא מחזיר סטטיסטיקות
-
-            except:
-                pass  # fallback יהיה למידע בסיסי מה־node
-
-            disk_used = round(disk_used_total / 1024**3, 1)
-            disk_total = round(disk_total_total / 1024**3, 1)
-
-            # משיכת VM ו־CT
-            vms_resp = requests.get(f"{base_url}/nodes/{node_name}/qemu", headers=headers, verify=False, timeout=5)
-            vms_resp.raise_for_status()
-            vms = vms_resp.json()["data"]
-            for vm in vms:
-                vm["type"] = "qemu"
-
-            cts_resp = requests.get(f"{base_url}/nodes/{node_name}/lxc", headers=headers, verify=False, timeout=5)
-            cts_resp.raise_for_status()
-            cts = cts_resp.json()["data"]
-            for ct in cts:
-                ct["type"] = "lxc"
-
-            all_guests = vms + cts
-
-            vms_info = []
-            for guest in all_guests:
-                vm_id = guest["vmid"]
-                vm_name = guest.get("name", f"VM-{vm_id}")
-                status = guest["status"]
-                guest_type = guest["type"]
-
-                if status == "running":
-                    stats_resp = requests.get(
-                        f"{base_url}/nodes/{node_name}/{guest_type}/{vm_id}/status/current",
-                        headers=headers,
-                        verify=False,
-                        timeout=5
-                    )
-                    stats_resp.raise_for_status()
-                    stats = stats_resp.json()["data"]
-
-                    cpu = stats.get("cpu", 0)
-                    mem_used_vm = round(stats.get("mem", 0) / 1024**3, 1)
-                    mem_total_vm = round(stats.get("maxmem", 0) / 1024**3, 1)
-                    disk_used_vm = round(stats.get("disk", 0) / 1024**3, 1)
-                    disk_total_vm = round(stats.get("maxdisk", 0) / 1024**3, 1)
-
-                    vms_info.append({
-                        "name": vm_name,
-                        "status": status,
-                        "type": guest_type,
-                        "cpu": cpu,
-                        "ram": {"used": mem_used_vm, "total": mem_total_vm},
-                        "disk": {"used": disk_used_vm, "total": disk_total_vm}
-                    })
-                else:
-                    vms_info.append({
-                        "name": vm_name,
-                        "status": status,
-                        "type": guest_type
-                    })
-
-            result.append({
-                "node": node_name,
-                "stats": {
-                    "cpu": cpu_percent,
-                    "ram": {"used": mem_used, "total": mem_total},
-                    "disk": {"used": disk_used, "total": disk_total},
-                },
-                "vms": vms_info
-            })
-
-        return result
+        after = decode_cursor(cursor, sort, order == "desc") if cursor else None
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    try:
+        snapshot, _ = await run_in_threadpool(get_clusters_snapshot, clusters)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    items, next_cursor, total = guest_index(snapshot).query(
+        {"cluster": cluster, "node": node, "type": type, "status": status},
+        q, sort, order == "desc", limit, after
+    )
+    return {"items": items, "total": total, "next_cursor": next_cursor}
+
+@router.get("/storages")
+async def list_storages():
+    clusters = await load_clusters_async()
+    if not clusters:
+        raise HTTPException(status_code=400, detail="Proxmox settings not configured")
 
+    try:
+        snapshot, _ = await run_in_threadpool(get_clusters_snapshot, clusters)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
+    return storage_status(snapshot.data)
+
+@router.get("/stream")
+async def stream_proxmox_status(request: Request):
+    clusters = await load_clusters_async()
+    if not clusters:
+        raise HTTPException(status_code=400, detail="Proxmox settings not configured")
+
+    return StreamingResponse(
+        status_stream(request, clusters),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _query_history(*args):
+    # query_history is sync (metrics store, shared with the monitor thread) – runs on a
+    # sync session in the threadpool rather than inside the event loop
+    db = SessionLocal()
+    try:
+        return query_history(db, *args)
+    finally:
+        db.close()
+
+@router.get("/history")
+async def get_history(
+    kind: Literal["node", "guest", "storage"],
+    resource: str,
+    metric: Literal["cpu", "ram", "disk"],
+    start: int | None = None,
+    end: int | None = None,
+    points: int = Query(300, ge=10, le=1000),
+):
+    end = end or int(time.time())
+    start = start or end - 86400
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    history = await run_in_threadpool(_query_history, kind, resource, metric, start, end, points)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Series not found")
+
+    resolution, data = history
+    return {
+        "kind": kind,
+        "resource": resource,
+        "metric": metric,
+        "resolution": resolution,
+        "points": data
+    }
+
+@router.get("/collector-stats")
+async def get_collector_stats():
+    return snapshot_cache.stats()
+
 @router.get("/alerts")
-def get_alert_settings(db: Session = Depends(get_db)):
-    settings = db.query(dashboard_schemas.AlertSettings).first()
+async def get_alert_settings(db: AsyncSession = Depends(get_async_db)):
+    settings = await db.scalar(select(dashboard_schemas.AlertSettings))
     if not settings:
         settings = dashboard_schemas.AlertSettings()
         db.add(settings)
-        db.commit()
-        db.refresh(settings)
+        await db.commit()
+        await db.refresh(settings)
     return {
         "cpu": settings.cpu_alert,
         "ram": settings.ram_alert,
@@ -145,13 +165,13 @@ def get_alert_settings(db: Session = Depends(get_db)):
     }
 
 @router.put("/alerts")
-def update_alert_settings(payload: dict, db: Session = Depends(get_db)):
-    settings = db.query(dashboard_schemas.AlertSettings).first()
+async def update_alert_settings(payload: dict, db: AsyncSession = Depends(get_async_db)):
+    settings = await db.scalar(select(dashboard_schemas.AlertSettings))
     if not settings:
         settings = dashboard_schemas.AlertSettings()
         db.add(settings)
     settings.cpu_alert = payload.get("cpu", settings.cpu_alert)
     settings.ram_alert = payload.get("ram", settings.ram_alert)
     settings.disk_alert = payload.get("disk", settings.disk_alert)
-    db.commit()
+    await db.commit()
     return {"status": "updated"}
\ No newline at end of file
@@ -0,0 +1,232 @@
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from app.cogs.dashboard.collector import collect_snapshot
+from app.cogs.proxmox_client import get_client
+from app.cogs.dashboard.single_flight import SingleFlight
+from app.cogs.dashboard.snapshot_store import snapshot_store
+from app.cogs.metrics.store import record_in_background
+from app.configurations.config import SNAPSHOT_TTL, SNAPSHOT_MAX_STALE, SNAPSHOT_ERROR_TTL, COLLECTOR_MODE
+
+class CachedSnapshot:
+    def __init__(self, data: list, collected_at: float, duration: float):
+        self.data = data
+        self.collected_at = collected_at  # epoch seconds
+        self.duration = duration  # seconds spent collecting
+        self.encoded: dict = {}  # (media type, content encoding) -> (body, etag)
+        self.guest_index = None  # built on first inventory query
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.collected_at)
+
+class SnapshotCache:
+    # Process-wide cache of cluster snapshots, keyed by Proxmox connection.
+    # Fresh entries are served as-is, stale ones are served while a single background
+    # refresh runs, and only missing/expired entries block the caller. Concurrent
+    # collections of the same key are coalesced into one.
+    def __init__(self, ttl: float = SNAPSHOT_TTL, max_stale: float = SNAPSHOT_MAX_STALE):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._lock = threading.Lock()
+        self._entries: dict = {}
+        self._failures: dict = {}  # key -> (monotonic time, exception)
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.stale_hits = 0
+        self.collections = 0
+
+    def get(self, key, collect, max_age: float | None = None, allow_stale: bool = True) -> CachedSnapshot:
+        ttl = self.ttl if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(key)
+            fresh = entry is not None and entry.age <= ttl
+            stale = allow_stale and entry is not None and not fresh and entry.age <= ttl + self.max_stale
+            if fresh:
+                self.hits += 1
+            elif stale:
+                self.stale_hits += 1
+
+        if fresh:
+            return entry
+        if stale:
+            self._refresh_in_background(key, collect)
+            return entry
+
+        error = self.recent_failure(key)
+        if error is not None:
+            raise error
+        return self.refresh(key, collect)
+
+    def refresh(self, key, collect) -> CachedSnapshot:
+        return self._flight.do(key, lambda: self._collect(key, collect))
+
+    def _collect(self, key, collect) -> CachedSnapshot:
+        started = time.time()
+        try:
+            data = collect()
+        except Exception as e:
+            with self._lock:
+                self._failures[key] = (time.monotonic(), e)
+            raise
+        entry = CachedSnapshot(data, collected_at=time.time(), duration=time.time() - started)
+        with self._lock:
+            self._entries[key] = entry
+            self._failures.pop(key, None)
+            self.collections += 1
+        return entry
+
+    def recent_failure(self, key) -> Exception | None:
+        with self._lock:
+            failure = self._failures.get(key)
+        if failure is not None and time.monotonic() - failure[0] < SNAPSHOT_ERROR_TTL:
+            return failure[1]
+        return None
+
+    def peek(self, key, max_age: float | None = None) -> CachedSnapshot | None:
+        # Fresh entry or None, without ever collecting – a returned entry counts as a hit
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.age <= (self.ttl if max_age is None else max_age):
+                self.hits += 1
+                return entry
+        return None
+
+    def last(self, key) -> CachedSnapshot | None:
+        # Latest entry whatever its age – stale nodes are filled in from it
+        with self._lock:
+            return self._entries.get(key)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "collections": self.collections,
+            "coalesced": self._flight.coalesced,
+        }
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _refresh_in_background(self, key, collect):
+        if self._flight.in_flight(key):
+            return
+
+        def run():
+            try:
+                self.refresh(key, collect)
+            except Exception as e:
+                logging.error("❌ Background snapshot refresh failed: %s", e)
+
+        threading.Thread(target=run, daemon=True).start()
+
+snapshot_cache = SnapshotCache()
+
+_merged_lock = threading.Lock()
+_merged: dict = {}  # cluster names -> (entries key, merged CachedSnapshot)
+
+# In "external" mode snapshots come from the collector process instead of Proxmox
+_read_from_store = COLLECTOR_MODE == "external"
+
+def use_snapshot_store(enabled: bool):
+    global _read_from_store
+    _read_from_store = enabled
+
+def _client(cluster):
+    return get_client(cluster.host, cluster.token_id, cluster.token_secret)
+
+def _published(cluster) -> CachedSnapshot:
+    entry = snapshot_store.load(cluster.name)
+    if entry is None:
+        raise RuntimeError(f"No snapshot published for cluster {cluster.name} yet – is the collector running?")
+    return entry
+
+def get_cluster_snapshot(cluster, max_age: float | None = None, allow_stale: bool = True) -> CachedSnapshot:
+    if _read_from_store:
+        return _published(cluster)
+    client = _client(cluster)
+    max_age = cluster.scrape_interval if max_age is None else max_age
+
+    def collect():
+        data = collect_snapshot(client, previous=snapshot_cache.last(client.key))
+        record_in_background(data, int(time.time()), cluster=cluster.name)
+        return data
+
+    return snapshot_cache.get(client.key, collect, max_age=max_age, allow_stale=allow_stale)
+
+def collect_clusters(clusters: list, max_age: float | None = None, allow_stale: bool = True) -> list:
+    # [(cluster, CachedSnapshot | Exception)] – every cluster is scraped on its own
+    # thread, so a slow or failing cluster never holds up the others.
+    results = {}
+    pending = []
+    for cluster in clusters:
+        if _read_from_store:
+            entry = snapshot_store.load(cluster.name)
+        else:
+            entry = snapshot_cache.peek(_client(cluster).key, cluster.scrape_interval if max_age is None else max_age)
+        if entry is not None:
+            results[cluster.name] = entry
+        else:
+            pending.append(cluster)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+            futures = [(cluster, pool.submit(get_cluster_snapshot, cluster, max_age, allow_stale)) for cluster in pending]
+            for cluster, future in futures:
+                try:
+                    results[cluster.name] = future.result()
+                except Exception as e:
+                    logging.error("❌ Error Collecting Cluster %s: %s", cluster.name, e)
+                    results[cluster.name] = e
+
+    return [(cluster, results[cluster.name]) for cluster in clusters]
+
+def merge_snapshots(entries: list) -> CachedSnapshot:
+    # One snapshot for the dashboard, every node tagged with its cluster. The merged
+    # object is reused while its parts are unchanged, so its encodings stay cached.
+    names = tuple(name for name, _ in entries)
+    key = tuple((name, entry.collected_at) for name, entry in entries)
+    with _merged_lock:
+        cached = _merged.get(names)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+    merged = CachedSnapshot(
+        [{**node, "cluster": name} for name, entry in entries for node in entry.data],
+        collected_at=min(entry.collected_at for _, entry in entries),
+        duration=max(entry.duration for _, entry in entries),
+    )
+    with _merged_lock:
+        _merged[names] = (key, merged)
+    return merged
+
+def get_clusters_snapshot(clusters: list) -> tuple:
+    results = collect_clusters(clusters)
+    entries = [(cluster.name, result) for cluster, result in results if isinstance(result, CachedSnapshot)]
+    errors = {cluster.name: str(result) for cluster, result in results if not isinstance(result, CachedSnapshot)}
+    if not entries:
+        raise RuntimeError("; ".join(f"{name}: {error}" for name, error in errors.items()))
+    return merge_snapshots(entries), errors
+
+def peek_clusters_snapshot(clusters: list) -> CachedSnapshot | None:
+    # Clusters that failed recently are left out instead of forcing a new scrape
+    entries = []
+    for cluster in clusters:
+        if _read_from_store:
+            entry = snapshot_store.load(cluster.name)
+            if entry is not None:
+                entries.append((cluster.name, entry))
+            continue
+
+        key = _client(cluster).key
+        entry = snapshot_cache.peek(key, cluster.scrape_interval)
+        if entry is not None:
+            entries.append((cluster.name, entry))
+        elif snapshot_cache.recent_failure(key) is None:
+            return None
+    return merge_snapshots(entries) if entries else None
@@ -0,0 +1,55 @@
+import os
+import base64
+import tempfile
+import threading
+import orjson
+from app.cogs import database
+from app.configurations.config import SNAPSHOT_STORE_DIR
+
+class SnapshotStore:
+    # Snapshots published by the collector process, one file per cluster. Files are
+    # replaced atomically, and readers only re-parse a file when its mtime/size change.
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._loaded: dict = {}  # cluster name -> (stat key, CachedSnapshot)
+
+    def _path(self, name: str) -> str:
+        filename = base64.urlsafe_b64encode(name.encode()).decode().rstrip("=")
+        return os.path.join(self.directory, f"{filename}.json")
+
+    def publish(self, name: str, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        payload = orjson.dumps({"collected_at": entry.collected_at, "duration": entry.duration, "data": entry.data})
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, self._path(name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self, name: str):
+        from app.cogs.dashboard.snapshot_cache import CachedSnapshot
+
+        path = self._path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            loaded = self._loaded.get(name)
+            if loaded is not None and loaded[0] == stat_key:
+                return loaded[1]
+
+        with open(path, "rb") as f:
+            payload = orjson.loads(f.read())
+        entry = CachedSnapshot(payload["data"], collected_at=payload["collected_at"], duration=payload["duration"])
+        with self._lock:
+            self._loaded[name] = (stat_key, entry)
+        return entry
+
+snapshot_store = SnapshotStore(SNAPSHOT_STORE_DIR or os.path.join(database.DB_DIR, "snapshots"))
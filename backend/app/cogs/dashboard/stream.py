@@ -0,0 +1,75 @@
+import asyncio
+import json
+import time
+from starlette.concurrency import run_in_threadpool
+from app.cogs.dashboard.collector import to_dashboard_status
+from app.cogs.dashboard.snapshot_cache import get_clusters_snapshot, peek_clusters_snapshot
+from app.configurations.config import STREAM_POLL_INTERVAL, STREAM_KEEPALIVE
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), ensure_ascii=False)}\n\n"
+
+def diff_status(previous: list, current: list) -> dict:
+    # Only what changed between two dashboard payloads: node stats, and guests keyed by vmid.
+    # Nodes are identified by (cluster, node) since node names may repeat across clusters.
+    previous_nodes = {(node["cluster"], node["node"]): node for node in previous}
+    current_nodes = {(node["cluster"], node["node"]): node for node in current}
+
+    delta = {"nodes": [], "removed_nodes": [], "vms": []}
+    for (cluster, name), node in current_nodes.items():
+        old = previous_nodes.get((cluster, name))
+        if old is None or old["stats"] != node["stats"] or old["state"] != node["state"]:
+            delta["nodes"].append({
+                "cluster": cluster, "node": name, "stats": node["stats"],
+                "state": node["state"], "stale_since": node.get("stale_since"),
+            })
+
+        old_vms = {vm["vmid"]: vm for vm in old["vms"]} if old else {}
+        new_vms = {vm["vmid"]: vm for vm in node["vms"]}
+        upsert = [vm for vmid, vm in new_vms.items() if old_vms.get(vmid) != vm]
+        remove = [vmid for vmid in old_vms if vmid not in new_vms]
+        if upsert or remove:
+            delta["vms"].append({"cluster": cluster, "node": name, "upsert": upsert, "remove": remove})
+
+    delta["removed_nodes"] = [
+        {"cluster": cluster, "node": name} for cluster, name in previous_nodes if (cluster, name) not in current_nodes
+    ]
+
+    if not (delta["nodes"] or delta["removed_nodes"] or delta["vms"]):
+        return {}
+    return delta
+
+async def status_stream(request, clusters: list):
+    # Full snapshot first, then a delta every time the shared cache is refreshed
+    last_entry = None
+    last_status = None
+    last_sent = time.monotonic()
+
+    while not await request.is_disconnected():
+        entry = peek_clusters_snapshot(clusters)
+        if entry is None:
+            try:
+                entry, _ = await run_in_threadpool(get_clusters_snapshot, clusters)
+            except Exception as e:
+                yield sse_event("error", {"detail": str(e)})
+                last_sent = time.monotonic()
+                await asyncio.sleep(STREAM_POLL_INTERVAL)
+                continue
+
+        if entry is not last_entry:
+            status = to_dashboard_status(entry.data)
+            if last_status is None:
+                yield sse_event("snapshot", status)
+                last_sent = time.monotonic()
+            else:
+                delta = diff_status(last_status, status)
+                if delta:
+                    yield sse_event("delta", delta)
+                    last_sent = time.monotonic()
+            last_entry, last_status = entry, status
+
+        if time.monotonic() - last_sent >= STREAM_KEEPALIVE:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+
+        await asyncio.sleep(STREAM_POLL_INTERVAL)
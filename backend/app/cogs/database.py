@@ -1,6 +1,12 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.configurations.config import (
+    DATABASE_URL as CONFIGURED_DATABASE_URL, SQLITE_BUSY_TIMEOUT, SQLITE_MMAP_SIZE,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE,
+)
 import os
 
 # יצירת נתיב מלא למסד הנתונים בתוך app/db/
@@ -8,11 +14,48 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_DIR = os.path.join(BASE_DIR, "db")
 os.makedirs(DB_DIR, exist_ok=True)  # <-- זה החלק החשוב
 
-DATABASE_URL = f"sqlite:///{os.path.join(DB_DIR, 'proxmox_monitor.db')}"
+DATABASE_URL = CONFIGURED_DATABASE_URL or f"sqlite:///{os.path.join(DB_DIR, 'proxmox_monitor.db')}"
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# אותו מסד, דרייבר אסינכרוני עבור ה־routes
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def _async_url(url: str):
+    url = make_url(url)
+    return url.set(drivername=_ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+def _engine_options(url: str) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_pre_ping": True,  # חיבור שנסגר בצד השרת (restart/failover) מוחלף לפני שימוש
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+def _tune_sqlite(engine):
+    # WAL: readers don't block the writer, so the monitor thread and request handlers
+    # no longer serialize on the database lock. Applied to every new connection.
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.close()
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+_tune_sqlite(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# אותו מסד עבור ה־routes האסינכרוניים; ה־thread של הניטור וה־collector נשארים עם SessionLocal.
+# expire_on_commit=False – אחרי commit אפשר להחזיר את האובייקט בלי טעינה עצלה (שאסורה ב־async)
+async_engine = create_async_engine(_async_url(DATABASE_URL), **_engine_options(DATABASE_URL))
+_tune_sqlite(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
\ No newline at end of file
@@ -1,11 +1,10 @@
 from fastapi import FastAPI, Depends, HTTPException
 from app.configurations.config import SECRET_KEY, ALGORITHM, oauth2_scheme
-from app.cogs import models
-from sqlalchemy.orm import Session
+from app.cogs.lookup_cache import get_user_async
 from jose import JWTError, jwt
-from app.cogs.get_db import get_db
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# המשתמש מגיע מה־cache (אובייקט מנותק) – נתיב שמשנה אותו צריך לטעון אותו מחדש ב־Session שלו
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
@@ -19,7 +18,7 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await get_user_async(email)
     if user is None:
         raise credentials_exception
     return user
\ No newline at end of file
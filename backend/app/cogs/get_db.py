@@ -6,4 +6,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with database.AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
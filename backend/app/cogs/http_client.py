@@ -0,0 +1,22 @@
+import httpx
+from app.configurations.config import HTTP_TIMEOUT, HTTP_MAX_CONNECTIONS
+
+# AsyncClient אחד לכל התהליך – חיבורים נשמרים בין בקשות, וקריאה איטית
+# ל־OIDC/Telegram/Discord לא תופסת thread מה־pool
+_client: httpx.AsyncClient | None = None
+
+def http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS),
+        )
+    return _client
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
\ No newline at end of file
@@ -0,0 +1,92 @@
+import threading
+import time
+from starlette.concurrency import run_in_threadpool
+from app.cogs import database, models
+from app.cogs.system_settings import models as settings_models
+from app.configurations.config import LOOKUP_CACHE_TTL
+
+_MISSING = object()
+
+class ReadThroughCache:
+    # Values are loaded in their own session and detached before they are stored,
+    # so a hit never touches the database. Writers call invalidate().
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (expires_at, value)
+        self._generation = 0
+
+    def get(self, key, load, keep_missing: bool = True):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            generation = self._generation
+
+        value = load()
+        with self._lock:
+            # טעינה שהתחילה לפני invalidate לא נשמרת – היא עלולה להחזיק ערך ישן
+            if generation == self._generation and (value is not None or keep_missing):
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def peek(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+        return _MISSING
+
+    async def aget(self, key, load, keep_missing: bool = True):
+        # For async routes: a hit stays on the event loop, only a miss goes to a thread
+        value = self.peek(key)
+        if value is _MISSING:
+            value = await run_in_threadpool(self.get, key, load, keep_missing)
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+lookup_cache = ReadThroughCache(LOOKUP_CACHE_TTL)
+
+def _load_detached(query):
+    db = database.SessionLocal()
+    try:
+        return query(db)
+    finally:
+        db.close()  # close() מנתק את האובייקטים; השדות שנטענו נשארים זמינים
+
+def _load_settings():
+    return _load_detached(lambda db: db.query(settings_models.SystemSettings).first())
+
+def _user_loader(email: str):
+    return lambda: _load_detached(lambda db: db.query(models.User).filter(models.User.email == email).first())
+
+def get_settings():
+    return lookup_cache.get("settings", _load_settings)
+
+async def get_settings_async():
+    return await lookup_cache.aget("settings", _load_settings)
+
+# Misses are not cached, so a freshly created user is visible right away
+def get_user(email: str):
+    return lookup_cache.get(("user", email), _user_loader(email), keep_missing=False)
+
+async def get_user_async(email: str):
+    return await lookup_cache.aget(("user", email), _user_loader(email), keep_missing=False)
+
+def invalidate_settings():
+    # The legacy Proxmox host lives in SystemSettings, so the cluster list goes too
+    lookup_cache.invalidate("settings")
+    lookup_cache.invalidate("clusters")
+
+def invalidate_clusters():
+    lookup_cache.invalidate("clusters")
+
+def invalidate_user(email: str):
+    lookup_cache.invalidate(("user", email))
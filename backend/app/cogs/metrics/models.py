@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, String, Float, Index, UniqueConstraint
+from app.cogs.database import Base
+
+class MetricSeries(Base):
+    __tablename__ = "metric_series"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # node / guest / storage
+    resource = Column(String, nullable=False)  # <cluster>/pve1, <cluster>/101, <cluster>/pve1/local-lvm, <cluster>/ceph (shared)
+    metric = Column(String, nullable=False)  # cpu / ram / disk
+
+    __table_args__ = (UniqueConstraint("kind", "resource", "metric", name="uq_metric_series"),)
+
+class MetricSample(Base):
+    __tablename__ = "metric_samples"
+
+    series_id = Column(Integer, primary_key=True)
+    ts = Column(Integer, primary_key=True)  # epoch seconds
+    value = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("ix_metric_samples_ts", "ts"),
+        {"sqlite_with_rowid": False},
+    )
+
+class MetricRollup(Base):
+    __tablename__ = "metric_rollups"
+
+    resolution = Column(Integer, primary_key=True)  # 60 / 900 / 3600
+    series_id = Column(Integer, primary_key=True)
+    ts = Column(Integer, primary_key=True)  # bucket start, epoch seconds
+    count = Column(Integer, nullable=False)
+    sum = Column(Float, nullable=False)
+    min = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("ix_metric_rollups_resolution_ts", "resolution", "ts"),
+        {"sqlite_with_rowid": False},
+    )
+
+class MetricRollupState(Base):
+    __tablename__ = "metric_rollup_state"
+
+    resolution = Column(Integer, primary_key=True)
+    last_ts = Column(Integer, nullable=False)  # buckets before this are rolled up
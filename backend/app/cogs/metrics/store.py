@@ -0,0 +1,240 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select, insert, delete, func, literal, Integer
+from sqlalchemy.orm import Session
+from app.cogs.metrics.models import MetricSeries, MetricSample, MetricRollup, MetricRollupState
+from app.cogs.metrics.downsample import lttb
+from app.cogs.database import SessionLocal
+from app.configurations.config import (
+    METRICS_RETENTION, METRICS_ROLLUP_INTERVAL, SNAPSHOT_TTL, SNAPSHOT_MAX_STALE
+)
+
+# (resolution, source resolution) – each tier is built from the one before it, 0 = raw samples
+ROLLUP_TIERS = ((60, 0), (900, 60), (3600, 900))
+
+# A cached snapshot can be recorded up to this long after it was collected,
+# so buckets stay open for that long before they are rolled up.
+LATE_SAMPLE_GRACE = SNAPSHOT_TTL + SNAPSHOT_MAX_STALE
+
+# How many stored rows we are willing to read per requested point when picking
+# a tier for a history query.
+HISTORY_OVERSAMPLE = 4
+
+_series_ids: dict = {}
+_series_lock = threading.Lock()
+_last_maintenance = 0.0
+
+# Every freshly collected snapshot is recorded, on a single writer thread so
+# scrapes never wait on the database.
+_recorder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="metrics-recorder")
+
+def _percent(used, total) -> float:
+    return round(used / total * 100, 2)
+
+def snapshot_samples(snapshot: list, cluster: str | None = None):
+    # resources are prefixed with the cluster name, since node names and vmids repeat across clusters
+    prefix = f"{cluster}/" if cluster else ""
+    shared = set()
+    for node in snapshot:
+        if node.get("state", "online") != "online":
+            continue  # stale/unreachable nodes carry old or no data
+        node_name = f"{prefix}{node['node']}"
+        yield "node", node_name, "cpu", round(node["cpu"] * 100, 2)
+        if node["maxmem"]:
+            yield "node", node_name, "ram", _percent(node["mem"], node["maxmem"])
+        if node["disk_total"]:
+            yield "node", node_name, "disk", _percent(node["disk_used"], node["disk_total"])
+
+        for storage in node.get("storages", []):
+            if not storage["total"]:
+                continue
+            if not storage["shared"]:
+                yield "storage", f"{node_name}/{storage['storage']}", "disk", _percent(storage["used"], storage["total"])
+            elif storage["storage"] not in shared:
+                # shared storages are one series per cluster
+                shared.add(storage["storage"])
+                yield "storage", f"{prefix}{storage['storage']}", "disk", _percent(storage["used"], storage["total"])
+
+        for guest in node["guests"]:
+            if guest["status"] != "running" or guest.get("state") == "stale":
+                continue  # a guest that didn't answer carries old or no usage
+            resource = f"{prefix}{guest['vmid']}"
+            yield "guest", resource, "cpu", round(guest["cpu"] * 100, 2)
+            if guest["maxmem"]:
+                yield "guest", resource, "ram", _percent(guest["mem"], guest["maxmem"])
+            if guest["maxdisk"]:
+                yield "guest", resource, "disk", _percent(guest["disk"], guest["maxdisk"])
+
+def _insert_ignore(db: Session, table, rows: list):
+    # INSERT ... ON CONFLICT DO NOTHING, in the dialect of the bound engine
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        db.execute(insert(table), rows)
+        return
+    db.execute(dialect_insert(table).on_conflict_do_nothing(), rows)
+
+def _load_series(db: Session) -> dict:
+    return {
+        (kind, resource, metric): series_id
+        for series_id, kind, resource, metric in db.execute(
+            select(MetricSeries.id, MetricSeries.kind, MetricSeries.resource, MetricSeries.metric)
+        )
+    }
+
+def resolve_series(db: Session, keys, create: bool = True) -> dict:
+    # The lock only guards the dict swap – DB reads/writes happen outside it, so a caller
+    # waiting on I/O never blocks another thread (or the event loop) on the lock
+    missing = [key for key in keys if key not in _series_ids]
+    if missing:
+        loaded = _load_series(db)
+        if create and any(key not in loaded for key in missing):
+            _insert_ignore(db, MetricSeries.__table__, [
+                {"kind": kind, "resource": resource, "metric": metric}
+                for kind, resource, metric in set(missing) if (kind, resource, metric) not in loaded
+            ])
+            db.commit()
+            loaded = _load_series(db)
+        with _series_lock:
+            _series_ids.update(loaded)
+    return {key: _series_ids[key] for key in keys if key in _series_ids}
+
+def record_snapshot(db: Session, snapshot: list, ts: int, cluster: str | None = None):
+    samples = list(snapshot_samples(snapshot, cluster))
+    if not samples:
+        return
+    series_ids = resolve_series(db, [(kind, resource, metric) for kind, resource, metric, _ in samples])
+    _insert_ignore(db, MetricSample.__table__, [
+        {"series_id": series_ids[(kind, resource, metric)], "ts": ts, "value": value}
+        for kind, resource, metric, value in samples
+    ])
+    db.commit()
+
+def _record(snapshot: list, ts: int, cluster: str | None):
+    db = SessionLocal()
+    try:
+        record_snapshot(db, snapshot, ts, cluster)
+    except Exception as e:
+        db.rollback()
+        logging.error("❌ Error Storing Metrics: %s", e)
+    finally:
+        db.close()
+
+def record_in_background(snapshot: list, ts: int, cluster: str | None = None):
+    _recorder.submit(_record, snapshot, ts, cluster)
+
+def rollup(db: Session, now: int):
+    for resolution, source in ROLLUP_TIERS:
+        state = db.get(MetricRollupState, resolution)
+        start = state.last_ts if state else 0
+        end = ((now - LATE_SAMPLE_GRACE) // resolution) * resolution
+        if end <= start:
+            continue
+
+        if source == 0:
+            bucket = (MetricSample.ts // resolution) * resolution
+            query = (
+                select(
+                    literal(resolution, Integer), MetricSample.series_id, bucket,
+                    func.count(), func.sum(MetricSample.value), func.min(MetricSample.value), func.max(MetricSample.value),
+                )
+                .where(MetricSample.ts >= start, MetricSample.ts < end)
+                .group_by(MetricSample.series_id, bucket)
+            )
+        else:
+            bucket = (MetricRollup.ts // resolution) * resolution
+            query = (
+                select(
+                    literal(resolution, Integer), MetricRollup.series_id, bucket,
+                    func.sum(MetricRollup.count), func.sum(MetricRollup.sum), func.min(MetricRollup.min), func.max(MetricRollup.max),
+                )
+                .where(MetricRollup.resolution == source, MetricRollup.ts >= start, MetricRollup.ts < end)
+                .group_by(MetricRollup.series_id, bucket)
+            )
+
+        db.execute(insert(MetricRollup).from_select(
+            ["resolution", "series_id", "ts", "count", "sum", "min", "max"], query
+        ))
+        if state:
+            state.last_ts = end
+        else:
+            db.add(MetricRollupState(resolution=resolution, last_ts=end))
+    db.commit()
+
+def apply_retention(db: Session, now: int):
+    for resolution, keep in METRICS_RETENTION.items():
+        cutoff = now - keep
+        if resolution == 0:
+            db.execute(delete(MetricSample).where(MetricSample.ts < cutoff))
+        else:
+            db.execute(delete(MetricRollup).where(MetricRollup.resolution == resolution, MetricRollup.ts < cutoff))
+    db.commit()
+
+def maintain(db: Session):
+    global _last_maintenance
+    if time.time() - _last_maintenance < METRICS_ROLLUP_INTERVAL:
+        return
+    _last_maintenance = time.time()
+    now = int(time.time())
+    rollup(db, now)
+    apply_retention(db, now)
+
+def _raw_rows(db: Session, series_id: int, start: int, end: int, limit: int) -> int:
+    # Raw density follows however often snapshots are collected, so it is counted
+    # rather than assumed – stopping at `limit`, which is all the caller needs to know
+    rows = (
+        select(literal(1))
+        .where(MetricSample.series_id == series_id, MetricSample.ts >= start, MetricSample.ts < end)
+        .limit(limit + 1)
+        .subquery()
+    )
+    return db.execute(select(func.count()).select_from(rows)).scalar()
+
+def pick_resolution(db: Session, series_id: int, start: int, end: int, points: int, now: int) -> int:
+    span = end - start
+    budget = points * HISTORY_OVERSAMPLE
+    if start >= now - METRICS_RETENTION[0] and _raw_rows(db, series_id, start, end, budget) <= budget:
+        return 0
+    for resolution, _ in ROLLUP_TIERS:
+        if start < now - METRICS_RETENTION[resolution]:
+            continue
+        if span / resolution <= budget:
+            return resolution
+    return ROLLUP_TIERS[-1][0]
+
+def query_history(db: Session, kind: str, resource: str, metric: str, start: int, end: int, points: int):
+    series_id = resolve_series(db, [(kind, resource, metric)], create=False).get((kind, resource, metric))
+    if series_id is None:
+        return None
+
+    resolution = pick_resolution(db, series_id, start, end, points, int(time.time()))
+    raw_from = start
+    rows = []
+    if resolution:
+        rows = db.execute(
+            select(MetricRollup.ts, MetricRollup.sum / MetricRollup.count)
+            .where(
+                MetricRollup.resolution == resolution,
+                MetricRollup.series_id == series_id,
+                MetricRollup.ts >= start,
+                MetricRollup.ts < end,
+            )
+            .order_by(MetricRollup.ts)
+        ).all()
+        # השלמת הזנב שעדיין לא עבר rollup מהדגימות הגולמיות
+        state = db.get(MetricRollupState, resolution)
+        raw_from = max(start, state.last_ts if state else end)
+
+    rows += db.execute(
+        select(MetricSample.ts, MetricSample.value)
+        .where(MetricSample.series_id == series_id, MetricSample.ts >= raw_from, MetricSample.ts < end)
+        .order_by(MetricSample.ts)
+    ).all()
+
+    data = [(ts, round(value, 2)) for ts, value in rows]
+    return resolution, lttb(data, points)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text  # הוספת Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Index  # הוספת Boolean
 from datetime import datetime
 from app.cogs.database import Base
 
@@ -22,4 +22,11 @@ class AuditLog(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
     action = Column(String, nullable=False)
     performed_by = Column(String, nullable=False)  # או Email או User ID
-    details = Column(Text, nullable=True)
\ No newline at end of file
+    details = Column(Text, nullable=True)
+
+    # דפדוף keyset לפי (timestamp, id), עם או בלי סינון לפי מבצע/פעולה
+    __table_args__ = (
+        Index("ix_audit_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_audit_logs_performed_by_timestamp_id", "performed_by", "timestamp", "id"),
+        Index("ix_audit_logs_action_timestamp_id", "action", "timestamp", "id"),
+    )
\ No newline at end of file
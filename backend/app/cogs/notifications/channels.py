@@ -0,0 +1,135 @@
+import html
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from app.configurations.config import (
+    NOTIFY_WORKERS, NOTIFY_TIMEOUT, TELEGRAM_RATE_LIMIT, DISCORD_RATE_LIMIT, TELEGRAM_MAX_LENGTH, DISCORD_MAX_LENGTH
+)
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"rate limited, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, count: int = 1) -> float:
+        # Takes `count` tokens at once and returns 0, or takes none and returns how long until they are available
+        count = min(count, self.burst)
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= count:
+                self.tokens -= count
+                return 0.0
+            return (count - self.tokens) / self.rate
+
+    def pause(self, seconds: float):
+        # The API told us to back off – nothing goes out on this bot until then
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+def _length(text: str) -> int:
+    # Both APIs count UTF-16 code units, so an emoji counts as two
+    return len(text.encode("utf-16-le")) // 2
+
+def fit(message: str, limit: int) -> str:
+    # Keeps whole lines up to the channel limit; a 400 for a long digest would drop it entirely
+    if _length(message) <= limit:
+        return message
+    lines = message.split("\n")
+    kept = []
+    size = 0
+    for index, line in enumerate(lines):
+        marker = f"… +{len(lines) - index} more"
+        if size + _length(line) + 1 + _length(marker) > limit:
+            if not kept:  # a single line longer than the limit; halved – up to 2 units per character
+                return line[:max(0, limit - _length(marker) - 1) // 2] + "\n" + marker
+            return "\n".join(kept + [marker])
+        kept.append(line)
+        size += _length(line) + 1
+    return "\n".join(kept)
+
+_lock = threading.Lock()
+_buckets: dict = {}
+_sessions: dict = {}
+
+def _bucket(key, rate_limit) -> TokenBucket:
+    with _lock:
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(*rate_limit)
+        return _buckets[key]
+
+def _session(kind: str) -> requests.Session:
+    # One pooled session per channel type, shared by all dispatch workers
+    with _lock:
+        if kind not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=NOTIFY_WORKERS)
+            session.mount("https://", adapter)
+            _sessions[kind] = session
+        return _sessions[kind]
+
+class TelegramChannel:
+    name = "Telegram"
+
+    def __init__(self, token: str, chat_id: str):
+        self.token = token
+        self.chat_id = chat_id
+        self.bucket = _bucket(("telegram", token), TELEGRAM_RATE_LIMIT)
+
+    def send(self, message: str, preformatted: bool = False):
+        message = fit(message, TELEGRAM_MAX_LENGTH)  # the limit applies after <pre> is parsed
+        payload = {"chat_id": self.chat_id, "text": message}
+        if preformatted:
+            payload = {"chat_id": self.chat_id, "text": f"<pre>{html.escape(message)}</pre>", "parse_mode": "HTML"}
+        response = _session("telegram").post(
+            f"https://api.telegram.org/bot{self.token}/sendMessage",
+            json=payload,
+            timeout=NOTIFY_TIMEOUT,
+        )
+        if response.status_code == 429:
+            raise RateLimited(float(response.json().get("parameters", {}).get("retry_after", 1)))
+        response.raise_for_status()
+
+class DiscordChannel:
+    name = "Discord"
+
+    def __init__(self, bot_token: str, channel_id: str):
+        self.bot_token = bot_token
+        self.channel_id = channel_id
+        self.bucket = _bucket(("discord", bot_token), DISCORD_RATE_LIMIT)
+
+    def send(self, message: str, preformatted: bool = False):
+        if preformatted:
+            message = f"```\n{fit(message, DISCORD_MAX_LENGTH - 8)}\n```"
+        else:
+            message = fit(message, DISCORD_MAX_LENGTH)
+        response = _session("discord").post(
+            f"https://discord.com/api/v10/channels/{self.channel_id}/messages",
+            headers={"Authorization": f"Bot {self.bot_token}"},
+            json={"content": message},
+            timeout=NOTIFY_TIMEOUT,
+        )
+        if response.status_code == 429:
+            raise RateLimited(float(response.json().get("retry_after", response.headers.get("Retry-After", 1))))
+        response.raise_for_status()
+
+def channels_for_settings(settings) -> list:
+    channels = []
+    if settings.discord_enabled and settings.discord_bot_token and settings.discord_channel_id:
+        channels.append(DiscordChannel(settings.discord_bot_token, settings.discord_channel_id))
+    if settings.telegram_enabled and settings.telegram_bot_token and settings.telegram_chat_id:
+        channels.append(TelegramChannel(settings.telegram_bot_token, settings.telegram_chat_id))
+    return channels
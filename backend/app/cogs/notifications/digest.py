@@ -0,0 +1,59 @@
+from app.cogs.alerts.state import RESOLVED
+from app.configurations.config import DIGEST_MAX_DETAILS
+
+class Digest:
+    # Gathers alert events until the window closes; window 0 = flush every cycle
+    def __init__(self, window: float):
+        self.window = window
+        self.events = []
+        self.opened_at = None
+
+    def add(self, events: list, now: float):
+        if events and self.opened_at is None:
+            self.opened_at = now
+        self.events.extend(events)
+
+    def closes_at(self) -> float | None:
+        # When the open window is due to be taken, so the loop can wake up for it
+        if not self.events:
+            return None
+        return self.opened_at + self.window
+
+    def take(self, now: float) -> list:
+        if not self.events or (self.window > 0 and now - self.opened_at < self.window):
+            return []
+        events, self.events, self.opened_at = self.events, [], None
+        return events
+
+def _worst(event) -> str:
+    target = event.metric.upper() if event.kind == "node" else f"{event.kind} {event.metric.upper()}"
+    return f"{target} {event.value:.1f}%"
+
+def render_digest(events: list) -> str:
+    # שורת סיכום, טבלה של השרתים שנפגעו, ואחריה פירוט ההתראות עצמן
+    firing = [event for event in events if event.status != RESOLVED]
+    resolved = [event for event in events if event.status == RESOLVED]
+
+    rows = {}
+    for event in events:
+        row = rows.setdefault(event.node or "-", {"alerts": 0, "resolved": 0, "worst": None})
+        if event.status == RESOLVED:
+            row["resolved"] += 1
+            continue
+        row["alerts"] += 1
+        if row["worst"] is None or event.value > row["worst"].value:
+            row["worst"] = event
+
+    table = [("Node", "Alerts", "Resolved", "Worst")] + [
+        (node, str(row["alerts"]), str(row["resolved"]), _worst(row["worst"]) if row["worst"] else "-")
+        for node, row in sorted(rows.items(), key=lambda item: (-item[1]["alerts"], item[0]))
+    ]
+    widths = [max(len(line[column]) for line in table) for column in range(4)]
+
+    lines = [f"🚨 סיכום התראות: {len(firing)} פעילות, {len(resolved)} חזרו לתקין", ""]
+    lines += ["  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip() for line in table]
+    lines.append("")
+    lines += [event.text for event in events[:DIGEST_MAX_DETAILS]]
+    if len(events) > DIGEST_MAX_DETAILS:
+        lines.append(f"… +{len(events) - DIGEST_MAX_DETAILS}")
+    return "\n".join(lines)
@@ -0,0 +1,116 @@
+import time
+import heapq
+import queue
+import random
+import logging
+import itertools
+import threading
+import requests
+from app.cogs.notifications.channels import RateLimited, channels_for_settings
+from app.configurations.config import NOTIFY_WORKERS, NOTIFY_RETRIES, NOTIFY_BACKOFF, NOTIFY_MAX_BACKOFF
+
+class Job:
+    def __init__(self, channel, message: str, preformatted: bool = False):
+        self.channel = channel
+        self.message = message
+        self.preformatted = preformatted
+        self.attempt = 0
+
+class Dispatcher:
+    # Notifications are queued and sent by a pool of workers, so callers never wait
+    # on Telegram/Discord. Jobs that have to wait (rate limit, retry backoff) are parked
+    # in a delay heap instead of holding a worker.
+    def __init__(self, workers: int = NOTIFY_WORKERS):
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._delayed = []  # (due, seq, job)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._pending = 0
+        self._started = False
+        self.sent = 0
+        self.failed = 0
+
+    def start(self):
+        with self._condition:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+        threading.Thread(target=self._delay_loop, daemon=True).start()
+
+    def submit(self, channel, message: str, preformatted: bool = False):
+        self.start()
+        with self._condition:
+            self._pending += 1
+        self._queue.put(Job(channel, message, preformatted))
+
+    def flush(self, timeout: float | None = None) -> bool:
+        # Waits until everything queued so far was sent or given up on
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _done(self, sent: bool):
+        with self._condition:
+            self._pending -= 1
+            if sent:
+                self.sent += 1
+            else:
+                self.failed += 1
+            self._condition.notify_all()
+
+    def _schedule(self, job: Job, delay: float):
+        with self._condition:
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._sequence), job))
+            self._condition.notify_all()
+
+    def _delay_loop(self):
+        while True:
+            with self._condition:
+                while not self._delayed or self._delayed[0][0] > time.monotonic():
+                    self._condition.wait(self._delayed[0][0] - time.monotonic() if self._delayed else None)
+                _, _, job = heapq.heappop(self._delayed)
+            self._queue.put(job)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            wait = job.channel.bucket.reserve()
+            if wait > 0:
+                self._schedule(job, wait)
+                continue
+
+            try:
+                job.channel.send(job.message, job.preformatted)
+            except RateLimited as e:
+                # Doesn't count as a failed attempt; the whole bot pauses for retry_after
+                logging.warning("⏳ %s Rate Limited, Retrying In %.1fs", job.channel.name, e.retry_after)
+                job.channel.bucket.pause(e.retry_after)
+                self._schedule(job, e.retry_after)
+                continue
+            except Exception as e:
+                job.attempt += 1
+                permanent = isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code < 500
+                if permanent or job.attempt > NOTIFY_RETRIES:
+                    logging.error("❌ Error Sending Alert To %s: %s", job.channel.name, e)
+                    self._done(False)
+                else:
+                    delay = min(NOTIFY_BACKOFF * 2 ** (job.attempt - 1), NOTIFY_MAX_BACKOFF)
+                    self._schedule(job, delay * random.uniform(0.8, 1.2))
+                continue
+
+            logging.info("📩 Alert Sent To %s", job.channel.name)
+            self._done(True)
+
+dispatcher = Dispatcher()
+
+def notify(settings, message: str, preformatted: bool = False):
+    for channel in channels_for_settings(settings):
+        dispatcher.submit(channel, message, preformatted)
@@ -0,0 +1,145 @@
+import re
+import time
+import threading
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from app.configurations.config import (
+    PROXMOX_MAX_WORKERS, PROXMOX_TIMEOUT, PROXMOX_RETRIES, PROXMOX_RETRY_BACKOFF,
+    BREAKER_FAILURES, BREAKER_RESET
+)
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+_NODE_PATH = re.compile(r"^/nodes/([^/]+)/")
+
+class CircuitOpen(Exception):
+    pass
+
+class CircuitBreaker:
+    # closed -> open after `failures` consecutive failures -> half-open after `reset`
+    # seconds, where a single probe call decides between closed and open again
+    def __init__(self, failures: int = BREAKER_FAILURES, reset: float = BREAKER_RESET):
+        self.failures = failures
+        self.reset = reset
+        self.state = "closed"
+        self.failed = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset:
+                self.state = "half-open"
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failed = 0
+
+    def failure(self):
+        with self._lock:
+            self.failed += 1
+            if self.state == "half-open" or self.failed >= self.failures:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+class ProxmoxClient:
+    # Keep-alive session per Proxmox host: one TLS handshake per pooled connection,
+    # pool sized to the collector concurrency, and retries for GETs only.
+    def __init__(self, host: str, token_id: str, token_secret: str,
+                 pool_size: int = PROXMOX_MAX_WORKERS, timeout: float = PROXMOX_TIMEOUT,
+                 retries: int = PROXMOX_RETRIES, backoff: float = PROXMOX_RETRY_BACKOFF):
+        self.key = client_key(host, token_id, token_secret)
+        self.base_url = f"https://{self.key[0]}/api2/json"
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breakers: dict = {}  # node -> CircuitBreaker
+        self._breakers_lock = threading.Lock()
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"PVEAPIToken={token_id}={token_secret}"
+        self.session.verify = False
+        self.session.mount("https://", adapter)
+
+    def breaker(self, node: str) -> CircuitBreaker:
+        with self._breakers_lock:
+            if node not in self.breakers:
+                self.breakers[node] = CircuitBreaker()
+            return self.breakers[node]
+
+    def _get_with_retries(self, path: str, timeout: float | None, deadline: float | None):
+        # Retries (connection errors, 5xx) are done here instead of by urllib3, so with a
+        # deadline every attempt and every backoff sleep stays inside the remaining budget
+        attempt = 0
+        while True:
+            call_timeout = timeout or self.timeout
+            if deadline is not None:
+                call_timeout = min(call_timeout, deadline - time.monotonic())
+                if call_timeout <= 0:
+                    raise requests.Timeout(f"Deadline reached before GET {path}")
+            try:
+                resp = self.session.get(f"{self.base_url}{path}", timeout=call_timeout)
+                resp.raise_for_status()
+                return resp
+            except requests.RequestException as e:
+                delay = self.backoff * 2 ** attempt
+                retryable = e.response is None or e.response.status_code >= 500
+                if not retryable or attempt >= self.retries or (deadline is not None and time.monotonic() + delay >= deadline):
+                    raise
+                attempt += 1
+                time.sleep(delay)
+
+    def get(self, path: str, timeout: float | None = None, deadline: float | None = None):
+        # Calls under /nodes/<node>/ go through that node's breaker, so a dead node
+        # fails fast instead of costing a timeout (plus retries) per call
+        match = _NODE_PATH.match(path)
+        breaker = self.breaker(match.group(1)) if match else None
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpen(f"Node {match.group(1)} is unreachable (circuit open)")
+
+        try:
+            resp = self._get_with_retries(path, timeout, deadline)
+        except requests.RequestException as e:
+            if breaker is not None:
+                if e.response is None or e.response.status_code >= 500:
+                    breaker.failure()
+                else:
+                    breaker.success()  # the node answered, the request itself was wrong
+            raise
+        if breaker is not None:
+            breaker.success()
+        return resp.json()["data"]
+
+    def close(self):
+        self.session.close()
+
+_clients: dict = {}
+_clients_lock = threading.Lock()
+
+def client_key(host: str, token_id: str, token_secret: str) -> tuple:
+    return host.strip().replace("https://", "").replace("http://", ""), token_id, token_secret
+
+def get_client(host: str, token_id: str, token_secret: str) -> ProxmoxClient:
+    key = client_key(host, token_id, token_secret)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = ProxmoxClient(host, token_id, token_secret)
+            _clients[key] = client
+        return client
+
+def retain_clients(clusters: list):
+    # Clients of clusters that were removed or got new connection settings are dropped
+    # and their pooled connections closed, instead of living as long as the process
+    keep = {client_key(cluster.host, cluster.token_id, cluster.token_secret) for cluster in clusters}
+    with _clients_lock:
+        stale = [_clients.pop(key) for key in list(_clients) if key not in keep]
+    for client in stale:
+        client.close()
@@ -38,4 +38,17 @@ class SystemSettings(Base):
     # Thresholds
     cpu_threshold = Column(Integer, default=90)
     ram_threshold = Column(Integer, default=90)
-    disk_threshold = Column(Integer, default=85)
\ No newline at end of file
+    disk_threshold = Column(Integer, default=85)
+
+class ProxmoxCluster(Base):
+    __tablename__ = "proxmox_clusters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+
+    host = Column(String, nullable=False)
+    token_id = Column(String, nullable=False)
+    token_secret = Column(String, nullable=False)
+
+    scrape_interval = Column(Integer, default=30)  # seconds a snapshot of this cluster stays fresh
+    enabled = Column(Boolean, default=True)
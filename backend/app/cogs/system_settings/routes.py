@@ -1,28 +1,33 @@
-import requests
+import httpx
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.cogs.get_db import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.cogs.get_db import get_async_db
 from app.cogs.system_settings import models as sys_models
 from app.cogs.system_settings import schemas as sys_schemas
 from app.cogs.dashboard import schemas as dashboard_schemas
 from app.cogs import models  # בשביל AuditLog ו־User
 from app.cogs.admin_panel.admin_guard import require_admin
 from app.cogs.admin_panel import audit_logger  # זה הקובץ שמכיל את log_action
-import urllib3
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from app.cogs.proxmox_client import ProxmoxClient
+from app.cogs.http_client import http_client
+from app.cogs.lookup_cache import invalidate_settings, invalidate_clusters
 
 router = APIRouter(prefix="/settings", tags=["System Settings"])
 
 @router.get("/", response_model=sys_schemas.SystemSettingsFullResponse)
-def get_settings(db: Session = Depends(get_db)):
-    settings = db.query(sys_models.SystemSettings).first()
+async def get_settings(db: AsyncSession = Depends(get_async_db)):
+    settings = await db.scalar(select(sys_models.SystemSettings))
     if not settings:
         settings = sys_models.SystemSettings()
         db.add(settings)
-        db.commit()
-        db.refresh(settings)
+        await db.commit()
+        invalidate_settings()
+        await db.refresh(settings)
 
-    alert_settings = db.query(dashboard_schemas.AlertSettings).first()
+    alert_settings = await db.scalar(select(dashboard_schemas.AlertSettings))
     if not alert_settings:
         cpu_alert = False
         ram_alert = False
@@ -40,12 +45,12 @@ def get_settings(db: Session = Depends(get_db)):
     }
 
 @router.put("/", response_model=sys_schemas.SystemSettingsResponse)
-def update_settings(
+async def update_settings(
     data: sys_schemas.SystemSettingsCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(require_admin)
 ):
-    settings = db.query(sys_models.SystemSettings).first()
+    settings = await db.scalar(select(sys_models.SystemSettings))
     if not settings:
         settings = sys_models.SystemSettings()
         db.add(settings)
@@ -66,10 +71,11 @@ def update_settings(
     settings.ram_threshold = data.ram_threshold
     settings.disk_threshold = data.disk_threshold
 
-    db.commit()
-    db.refresh(settings)
+    await db.commit()
+    invalidate_settings()
+    await db.refresh(settings)
 
-    audit_logger.log_action(
+    await audit_logger.log_action_async(
         db=db,
         action="עדכון הגדרות מערכת",
         performed_by=current_user.email,
@@ -79,11 +85,11 @@ def update_settings(
     return settings
 
 @router.delete("/")
-def reset_settings(
-    db: Session = Depends(get_db),
+async def reset_settings(
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(require_admin)
 ):
-    settings = db.query(sys_models.SystemSettings).first()
+    settings = await db.scalar(select(sys_models.SystemSettings))
     if not settings:
         raise HTTPException(status_code=404, detail="הגדרות לא קיימות למחיקה")
 
@@ -99,10 +105,11 @@ def reset_settings(
     settings.discord_channel_id = None
     settings.discord_enabled = False
 
-    db.commit()
+    await db.commit()
+    invalidate_settings()
 
     # 🔒 תיעוד בלוג
-    audit_logger.log_action(
+    await audit_logger.log_action_async(
         db=db,
         action="איפוס הגדרות מערכת",
         performed_by=current_user.email,
@@ -112,12 +119,12 @@ def reset_settings(
     return {"message": "הגדרות ההתראות אופסו בהצלחה"}
 
 @router.put("/proxmox", response_model=sys_schemas.SystemSettingsResponse)
-def update_proxmox_settings(
+async def update_proxmox_settings(
     data: sys_schemas.SystemSettingsBase,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(require_admin)
 ):
-    settings = db.query(sys_models.SystemSettings).first()
+    settings = await db.scalar(select(sys_models.SystemSettings))
     if not settings:
         raise HTTPException(status_code=404, detail="הגדרות מערכת לא קיימות")
 
@@ -125,10 +132,11 @@ def update_proxmox_settings(
     settings.proxmox_token_id = data.proxmox_token_id
     settings.proxmox_token_secret = data.proxmox_token_secret
 
-    db.commit()
-    db.refresh(settings)
+    await db.commit()
+    invalidate_settings()
+    await db.refresh(settings)
 
-    audit_logger.log_action(
+    await audit_logger.log_action_async(
         db=db,
         action="Proxmox עדכון הגדרות",
         performed_by=current_user.email,
@@ -138,11 +146,11 @@ def update_proxmox_settings(
     return settings
 
 @router.delete("/proxmox")
-def reset_proxmox_settings(
-    db: Session = Depends(get_db),
+async def reset_proxmox_settings(
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(require_admin)
 ):
-    settings = db.query(sys_models.SystemSettings).first()
+    settings = await db.scalar(select(sys_models.SystemSettings))
     if not settings:
         raise HTTPException(status_code=404, detail="הגדרות מערכת לא קיימות")
 
@@ -150,9 +158,10 @@ def reset_proxmox_settings(
     settings.proxmox_token_id = None
     settings.proxmox_token_secret = None
 
-    db.commit()
+    await db.commit()
+    invalidate_settings()
 
-    audit_logger.log_action(
+    await audit_logger.log_action_async(
         db=db,
         action="איפוס הגדרות Proxmox",
         performed_by=current_user.email,
@@ -162,29 +171,104 @@ def reset_proxmox_settings(
     return {"message": "ההגדרות של Proxmox אופסו בהצלחה"}
 
 @router.post("/proxmox/test")
-def test_proxmox_connection(
+async def test_proxmox_connection(
     data: sys_schemas.SystemSettingsBase,
     current_user: models.User = Depends(require_admin)
 ):
-    import requests
-
-    # ודא שה-Host לא כולל https://
-    host = data.proxmox_host.strip().replace("https://", "").replace("http://", "")
-    url = f"https://{host}/api2/json/nodes"
-
-    headers = {
-        "Authorization": f"PVEAPIToken={data.proxmox_token_id}={data.proxmox_token_secret}"
-    }
-
+    # client חד־פעמי בלי retries – ערכים שרק נבדקים לא נכנסים ל־cache של החיבורים
+    client = ProxmoxClient(data.proxmox_host, data.proxmox_token_id, data.proxmox_token_secret, pool_size=1, retries=0)
     try:
-        response = requests.get(url, headers=headers, verify=False, timeout=5)
-        response.raise_for_status()
+        await run_in_threadpool(client.get, "/nodes")
         return {"message": "✔️ החיבור הצליח"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        client.close()
     
+@router.get("/clusters", response_model=List[sys_schemas.ProxmoxClusterResponse])
+async def list_clusters(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(require_admin)
+):
+    result = await db.scalars(select(sys_models.ProxmoxCluster).order_by(sys_models.ProxmoxCluster.id))
+    return result.all()
+
+@router.post("/clusters", response_model=sys_schemas.ProxmoxClusterResponse)
+async def create_cluster(
+    data: sys_schemas.ProxmoxClusterBase,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(require_admin)
+):
+    if await db.scalar(select(sys_models.ProxmoxCluster).filter_by(name=data.name)):
+        raise HTTPException(status_code=400, detail="קלאסטר בשם הזה כבר קיים")
+
+    cluster = sys_models.ProxmoxCluster(**data.model_dump())
+    db.add(cluster)
+    await db.commit()
+    invalidate_clusters()
+    await db.refresh(cluster)
+
+    await audit_logger.log_action_async(
+        db=db,
+        action="Proxmox הוספת קלאסטר",
+        performed_by=current_user.email,
+        details=f"{cluster.name} ({cluster.host})"
+    )
+
+    return cluster
+
+@router.put("/clusters/{cluster_id}", response_model=sys_schemas.ProxmoxClusterResponse)
+async def update_cluster(
+    cluster_id: int,
+    data: sys_schemas.ProxmoxClusterBase,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(require_admin)
+):
+    cluster = await db.scalar(select(sys_models.ProxmoxCluster).filter_by(id=cluster_id))
+    if not cluster:
+        raise HTTPException(status_code=404, detail="קלאסטר לא נמצא")
+
+    for field, value in data.model_dump().items():
+        setattr(cluster, field, value)
+
+    await db.commit()
+    invalidate_clusters()
+    await db.refresh(cluster)
+
+    await audit_logger.log_action_async(
+        db=db,
+        action="Proxmox עדכון קלאסטר",
+        performed_by=current_user.email,
+        details=f"{cluster.name} ({cluster.host})"
+    )
+
+    return cluster
+
+@router.delete("/clusters/{cluster_id}")
+async def delete_cluster(
+    cluster_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(require_admin)
+):
+    cluster = await db.scalar(select(sys_models.ProxmoxCluster).filter_by(id=cluster_id))
+    if not cluster:
+        raise HTTPException(status_code=404, detail="קלאסטר לא נמצא")
+
+    await db.delete(cluster)
+    await db.commit()
+    invalidate_clusters()
+
+    await audit_logger.log_action_async(
+        db=db,
+        action="Proxmox מחיקת קלאסטר",
+        performed_by=current_user.email,
+        details=f"{cluster.name}"
+    )
+
+    return {"message": "הקלאסטר נמחק בהצלחה"}
+
 @router.post("/telegram/test")
-def test_telegram_connection(
+async def test_telegram_connection(
     data: sys_schemas.TelegramSettingsTest,
     current_user: models.User = Depends(require_admin)
 ):
@@ -196,19 +280,17 @@ def test_telegram_connection(
     }
 
     try:
-        response = requests.post(url, json=payload, timeout=5)
+        response = await http_client().post(url, json=payload)
         response.raise_for_status()
         return {"message": "החיבור לטלגרם תקין"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/discord/test")
-def test_discord_connection(
+async def test_discord_connection(
     data: sys_schemas.DiscordSettingsTest,
     current_user: models.User = Depends(require_admin)
 ):
-    import requests
-
     headers = {
         "Authorization": f"Bot {data.bot_token}",
         "Content-Type": "application/json"
@@ -216,14 +298,14 @@ def test_discord_connection(
 
     # 1. בדיקת הטוקן
     try:
-        user_resp = requests.get("https://discord.com/api/v10/users/@me", headers=headers, timeout=5)
+        user_resp = await http_client().get("https://discord.com/api/v10/users/@me", headers=headers)
         user_resp.raise_for_status()
     except Exception:
         raise HTTPException(status_code=400, detail="טוקן הדיסקורד שגוי או לא תקף")
 
     # 2. בדיקת שהבוט נמצא ב־Guild
     try:
-        guild_resp = requests.get(f"https://discord.com/api/v10/guilds/{data.guild_id}", headers=headers, timeout=5)
+        guild_resp = await http_client().get(f"https://discord.com/api/v10/guilds/{data.guild_id}", headers=headers)
         if guild_resp.status_code == 403:
             raise HTTPException(status_code=400, detail="⚠️ הבוט לא נמצא בשרת או אין לו הרשאה לגשת אליו")
         guild_resp.raise_for_status()
@@ -236,11 +318,10 @@ def test_discord_connection(
     }
 
     try:
-        send_resp = requests.post(
+        send_resp = await http_client().post(
             f"https://discord.com/api/v10/channels/{data.channel_id}/messages",
             headers=headers,
-            json=test_message,
-            timeout=5
+            json=test_message
         )
         if send_resp.status_code == 403:
             raise HTTPException(status_code=400, detail="🚫 אין לבוט הרשאה לשלוח הודעות בערוץ הזה")
@@ -251,12 +332,12 @@ def test_discord_connection(
     return {"message": "החיבור לדיסקורד תקין, וההודעה נשלחה בהצלחה לערוץ"}
 
 @router.put("/sso", response_model=sys_schemas.SystemSettingsResponse)
-def update_sso_settings(
+async def update_sso_settings(
     data: sys_schemas.SystemSettingsBase,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(require_admin)
 ):
-    settings = db.query(sys_models.SystemSettings).first()
+    settings = await db.scalar(select(sys_models.SystemSettings))
     if not settings:
         settings = sys_models.SystemSettings()
         db.add(settings)
@@ -269,10 +350,11 @@ def update_sso_settings(
     settings.oidc_scopes = data.oidc_scopes
     settings.oidc_response_type = data.oidc_response_type
 
-    db.commit()
-    db.refresh(settings)
+    await db.commit()
+    invalidate_settings()
+    await db.refresh(settings)
 
-    audit_logger.log_action(
+    await audit_logger.log_action_async(
         db=db,
         action="SSO עדכון הגדרות",
         performed_by=current_user.email,
@@ -282,8 +364,8 @@ def update_sso_settings(
     return settings
 
 @router.delete("/sso", status_code=204)
-def reset_sso_settings(db: Session = Depends(get_db), current_user: models.User = Depends(require_admin)):
-    settings = db.query(sys_models.SystemSettings).first()
+async def reset_sso_settings(db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(require_admin)):
+    settings = await db.scalar(select(sys_models.SystemSettings))
     if not settings:
         raise HTTPException(status_code=404, detail="Settings not found")
 
@@ -296,9 +378,10 @@ def reset_sso_settings(db: Session = Depends(get_db), current_user: models.User
     settings.oidc_scopes = None
     settings.oidc_response_type = None
 
-    db.commit()
+    await db.commit()
+    invalidate_settings()
 
-    audit_logger.log_action(
+    await audit_logger.log_action_async(
         db=db,
         action="SSO איפוס הגדרות",
         performed_by=current_user.email,
@@ -308,14 +391,12 @@ def reset_sso_settings(db: Session = Depends(get_db), current_user: models.User
     return
 
 @router.post("/sso/test")
-def test_sso_connection(
+async def test_sso_connection(
     data: sys_schemas.SystemSettingsBase,
     current_user: models.User = Depends(require_admin)
 ):
-    import requests
-
     try:
-        response = requests.get(data.oidc_discovery_url, timeout=5)
+        response = await http_client().get(data.oidc_discovery_url)
         response.raise_for_status()
         discovery_data = response.json()
 
@@ -327,7 +408,7 @@ def test_sso_connection(
 
         return {"message": "נשלף בהצלחה Discovery-תקין וה OIDC-החיבור ל ✔️"}
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=400, detail=f"{str(e)}")
     except ValueError:
         raise HTTPException(status_code=400, detail="התשובה מה־discovery URL אינה JSON תקף")
@@ -59,4 +59,18 @@ class DiscordSettingsTest(BaseModel):
 class SystemSettingsFullResponse(SystemSettingsResponse):
     cpu_alert: bool = False
     ram_alert: bool = False
-    disk_alert: bool = False
\ No newline at end of file
+    disk_alert: bool = False
+
+class ProxmoxClusterBase(BaseModel):
+    name: str
+    host: str
+    token_id: str
+    token_secret: str
+    scrape_interval: int = 30
+    enabled: bool = True
+
+class ProxmoxClusterResponse(ProxmoxClusterBase):
+    id: int
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import logging
+from colorama import Fore, Style
+
+# פתרון לבעיה של 'No module named app'
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from app.cogs import models, database
+from app.cogs.system_settings import models as system_models
+from app.cogs.dashboard import schemas as dashboard_schemas
+from app.cogs.metrics import models as metrics_models
+from app.cogs.alerts import models as alert_models
+from app.cogs.dashboard.clusters import load_clusters
+from app.cogs.dashboard.snapshot_cache import CachedSnapshot, collect_clusters, use_snapshot_store
+from app.cogs.dashboard.snapshot_store import snapshot_store
+from app.cogs.dashboard.monitor_alerts import start_monitoring
+from app.configurations.config import SNAPSHOT_TTL
+
+logging.basicConfig(level=logging.INFO)
+
+# Standalone collector: `python -m app.collector`
+# Scrapes every cluster on its scrape interval, publishes the snapshots for the web
+# workers (PROXMON_COLLECTOR_MODE=external) and runs the alerts/metrics loop once.
+
+def publish_loop():
+    published: dict = {}  # cluster name -> collected_at of the last published snapshot
+    while True:
+        clusters = load_clusters()
+
+        for cluster, snapshot in collect_clusters(clusters, allow_stale=False):
+            if not isinstance(snapshot, CachedSnapshot) or published.get(cluster.name) == snapshot.collected_at:
+                continue
+            try:
+                snapshot_store.publish(cluster.name, snapshot)
+                published[cluster.name] = snapshot.collected_at
+            except Exception as e:
+                logging.error("❌ Error Publishing Snapshot For %s: %s", cluster.name, e)
+
+        interval = min((cluster.scrape_interval or SNAPSHOT_TTL for cluster in clusters), default=SNAPSHOT_TTL)
+        time.sleep(max(1, interval))
+
+def main():
+    # This process is the one talking to Proxmox, whatever mode the web workers run in
+    use_snapshot_store(False)
+
+    models.Base.metadata.create_all(bind=database.engine)
+    system_models.Base.metadata.create_all(bind=database.engine)
+    dashboard_schemas.Base.metadata.create_all(bind=database.engine)
+    metrics_models.Base.metadata.create_all(bind=database.engine)
+    alert_models.Base.metadata.create_all(bind=database.engine)
+
+    logging.info(f"{Fore.GREEN}🚀 Collector started, publishing to {snapshot_store.directory}{Style.RESET_ALL}")
+    start_monitoring()
+    publish_loop()
+
+if __name__ == "__main__":
+    main()
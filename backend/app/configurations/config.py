@@ -1,3 +1,4 @@
+import os
 from fastapi.security import OAuth2PasswordBearer
 
 MACHINE_INTERNAL_IP = "<YOUR-IP>"
@@ -22,4 +23,96 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 #Alerts
-ALERTS_CHECK_TIME = 600  # in seconds
\ No newline at end of file
+ALERTS_CHECK_TIME = 600  # in seconds
+# Defaults for rules that don't set their own
+ALERT_FOR = 0  # seconds a breach must last before it fires
+ALERT_HYSTERESIS = 5  # percent points below the threshold a firing alert needs to resolve
+ALERT_COOLDOWN = 6 * 3600  # seconds between repeat notifications of a firing alert (0 = never repeat)
+
+#Alert Scheduling
+# Every cluster gets a full scrape on its own scrape_interval; resources close to a threshold or
+# changing quickly are also polled on their own, from SCHEDULER_MIN_INTERVAL backing off again
+# as they settle (up to ALERTS_CHECK_TIME).
+SCHEDULER_MIN_INTERVAL = 30  # seconds
+SCHEDULER_BACKOFF = 2  # interval multiplier after every calm poll
+SCHEDULER_NEAR_THRESHOLD = 10  # percent points of headroom below which a resource is hot
+SCHEDULER_FAST_CHANGE = 2  # percent points per minute that count as changing quickly
+SCHEDULER_JITTER = 0.1  # +-10% on every interval, so polls don't line up
+SCHEDULER_MAX_RPS = 5  # cap on single-resource requests per second toward pveproxy
+
+#Notifications
+NOTIFY_WORKERS = 4  # threads sending queued Telegram/Discord messages
+NOTIFY_TIMEOUT = 5  # seconds per send
+NOTIFY_RETRIES = 5
+NOTIFY_BACKOFF = 1  # seconds before the first retry, doubled on every retry
+NOTIFY_MAX_BACKOFF = 300
+NOTIFY_SHUTDOWN_TIMEOUT = 10  # seconds to drain the queue on shutdown
+ALERT_DIGEST = True  # one summary message per channel instead of one message per alert
+ALERT_DIGEST_WINDOW = 0  # seconds to gather alerts into one digest (0 = one digest per check cycle)
+DIGEST_MAX_DETAILS = 15  # alert lines listed under the summary table
+# (messages per second, burst) per bot
+TELEGRAM_RATE_LIMIT = (1, 3)
+DISCORD_RATE_LIMIT = (1, 5)
+# Longest message each API accepts (UTF-16 units); longer ones are cut at a line with "+N more"
+TELEGRAM_MAX_LENGTH = 4096
+DISCORD_MAX_LENGTH = 2000
+
+#Proxmox Collection
+PROXMOX_TIMEOUT = 5  # seconds per Proxmox API request
+PROXMOX_RETRIES = 2  # retries for idempotent GETs (connection errors, 5xx)
+PROXMOX_RETRY_BACKOFF = 0.5  # backoff factor between retries: 0.5s, 1s, 2s...
+PROXMOX_MAX_WORKERS = 16  # max concurrent requests to the Proxmox API per collection
+PROXMOX_COLLECTION_MODE = "cluster"  # "cluster" = one /cluster/resources call, "per_node" = walk every node
+BREAKER_FAILURES = 3  # consecutive failed calls to a node before its breaker opens
+BREAKER_RESET = 60  # seconds an open breaker fails fast before letting one probe call through
+COLLECTION_DEADLINE = 15  # seconds budget for one collection; nodes that miss it are reported stale
+SNAPSHOT_TTL = 30  # seconds a collected snapshot is served as fresh
+SNAPSHOT_MAX_STALE = 300  # seconds past the TTL a stale snapshot is still served while it refreshes in the background
+SNAPSHOT_ERROR_TTL = 10  # seconds a failed collection is remembered before the cluster is scraped again
+STREAM_POLL_INTERVAL = 2  # seconds between snapshot checks on /dashboard/stream
+STREAM_KEEPALIVE = 15  # seconds between SSE keep-alive comments
+
+#Collector Process
+# "embedded" – every web worker scrapes Proxmox and runs the alerts loop itself.
+# "external" – `python -m app.collector` does both once and publishes snapshots
+# to SNAPSHOT_STORE_DIR; web workers only read them.
+COLLECTOR_MODE = os.getenv("PROXMON_COLLECTOR_MODE", "embedded")
+SNAPSHOT_STORE_DIR = os.getenv("PROXMON_SNAPSHOT_DIR")  # default: app/cogs/db/snapshots
+
+#Metrics History
+METRICS_ROLLUP_INTERVAL = 60  # seconds between rollup/retention passes
+# resolution in seconds -> seconds to keep (0 = raw samples)
+METRICS_RETENTION = {
+    0: 2 * 86400,
+    60: 14 * 86400,
+    900: 120 * 86400,
+    3600: 400 * 86400,
+}
+
+#Lookup Cache
+# settings/users/clusters נקראים מהזיכרון; כתיבה מנקה מיד בתהליך שביצע אותה,
+# ה־TTL מגביל כמה זמן תהליך אחר (worker/collector) יכול להחזיק ערך ישן
+LOOKUP_CACHE_TTL = 60
+
+#Outbound HTTP (OIDC / Telegram / Discord from request handlers)
+HTTP_TIMEOUT = 5  # seconds
+HTTP_MAX_CONNECTIONS = 100
+
+#Database
+# ריק = קובץ SQLite בתוך app/cogs/db. כמה replicas על מסד אחד – PostgreSQL, לדוגמה:
+# postgresql://proxmon:secret@db:5432/proxmon
+DATABASE_URL = os.getenv("PROXMON_DATABASE_URL")
+SQLITE_BUSY_TIMEOUT = 5000  # ms a writer waits for the lock instead of failing with "database is locked"
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+DB_POOL_SIZE = int(os.getenv("PROXMON_DB_POOL_SIZE", 5))  # PostgreSQL only, per engine (sync + async)
+DB_MAX_OVERFLOW = int(os.getenv("PROXMON_DB_MAX_OVERFLOW", 10))
+DB_POOL_RECYCLE = 1800  # seconds
+
+#Audit Log
+# רשומות audit נאספות ונכתבות יחד – טרנזקציה אחת לכל מה שהגיע בחלון/עד גודל ה־batch
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_WINDOW = 0.2  # seconds to keep collecting after the first entry of a batch
+AUDIT_RETRIES = 3
+AUDIT_SYNC_TIMEOUT = 5  # seconds the audit log routes wait for queued entries to be committed
+AUDIT_SHUTDOWN_TIMEOUT = 10
+AUDIT_EXPORT_BATCH = 2000  # rows per query/chunk of the CSV export
\ No newline at end of file
@@ -7,7 +7,8 @@ from datetime import datetime
 from typing import List
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from contextlib import asynccontextmanager
 from colorama import Fore, Style
 
@@ -18,10 +19,11 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 # COGS
-from app.configurations.config import admin_email, admin_password, Host_IP, Host_Port
+from app.configurations.config import admin_email, admin_password, Host_IP, Host_Port, COLLECTOR_MODE, NOTIFY_SHUTDOWN_TIMEOUT, AUDIT_SHUTDOWN_TIMEOUT
 from app.cogs import models, database, schemas, auth
-from app.cogs.get_db import get_db
+from app.cogs.get_db import get_async_db
 from app.cogs.get_current_user import get_current_user
+from app.cogs.lookup_cache import invalidate_user
 from app.cogs.schemas import UserAdminView
 from app.cogs.admin_panel.admin_guard import require_admin
 from app.cogs.admin_panel import admin_routes
@@ -29,8 +31,14 @@ from app.cogs.system_settings import routes as system_settings_routes
 from app.cogs.system_settings import models as system_models
 from app.cogs.authentication import routes as sso_routes
 from app.cogs.dashboard import routes as dashboard_routes
+from app.cogs.alerts import routes as alert_routes
 from app.cogs.dashboard import schemas as dashboard_schemas
+from app.cogs.metrics import models as metrics_models
+from app.cogs.alerts import models as alert_models
 from app.cogs.dashboard.monitor_alerts import start_monitoring
+from app.cogs.notifications.dispatcher import dispatcher
+from app.cogs.admin_panel.audit_writer import audit_writer
+from app.cogs.http_client import close_http_client
 
 logging.basicConfig(level=logging.INFO)
 
@@ -41,7 +49,14 @@ async def lifespan(app: FastAPI):
     models.Base.metadata.create_all(bind=database.engine)
     system_models.Base.metadata.create_all(bind=database.engine)
     dashboard_schemas.Base.metadata.create_all(bind=database.engine)
-    start_monitoring()
+    metrics_models.Base.metadata.create_all(bind=database.engine)
+    alert_models.Base.metadata.create_all(bind=database.engine)
+    # create_all לא מוסיף אינדקסים חדשים לטבלה שכבר קיימת
+    for index in models.AuditLog.__table__.indexes:
+        index.create(bind=database.engine, checkfirst=True)
+    # במצב external תהליך ה-collector סורק ושולח התראות, ה-workers רק קוראים
+    if COLLECTOR_MODE != "external":
+        start_monitoring()
 
     # יצירת משתמש אדמין ברירת מחדל
     db = database.SessionLocal()
@@ -64,6 +79,12 @@ async def lifespan(app: FastAPI):
     
     yield
 
+    # התראות ורשומות audit שעדיין בתור נשלחות/נכתבות לפני שהתהליך יוצא
+    dispatcher.flush(timeout=NOTIFY_SHUTDOWN_TIMEOUT)
+    audit_writer.flush(timeout=AUDIT_SHUTDOWN_TIMEOUT)
+    await close_http_client()
+    await database.async_engine.dispose()
+
     # הפעלת React
     # try:
     #     # תיקון הנתיב כדי להגיע לתיקיית React שנמצאת מחוץ ל־backend
@@ -89,6 +110,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # ROUTES
@@ -96,21 +118,23 @@ app.include_router(admin_routes.router)
 app.include_router(system_settings_routes.router)
 app.include_router(sso_routes.router)
 app.include_router(dashboard_routes.router)
+app.include_router(alert_routes.router)
 
 @app.post("/login", response_model=schemas.TokenResponse)
-def login(user_login: schemas.UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user_login.email).first()
+async def login(user_login: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(models.User).filter(models.User.email == user_login.email))
     if not db_user or not auth.verify_password(user_login.password, db_user.password_hash):
         raise HTTPException(status_code=400, detail="אימייל או סיסמה שגויים")
     if not db_user.is_active:
         raise HTTPException(status_code=403, detail="המשתמש הזה אינו פעיל יותר")
     db_user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
+    invalidate_user(db_user.email)
     access_token = auth.create_access_token(data={"sub": db_user.email, "role": db_user.role})
     return {"access_token": access_token}
 
 @app.get("/me", response_model=schemas.UserInfo)
-def get_my_info(current_user: models.User = Depends(get_current_user)):
+async def get_my_info(current_user: models.User = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=403, detail="המשתמש לא פעיל")
     return {
@@ -122,32 +146,39 @@ def get_my_info(current_user: models.User = Depends(get_current_user)):
     }
 
 @app.post("/change-password")
-def change_password(
+async def change_password(
     data: schemas.ChangePasswordRequest,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if not auth.verify_password(data.current_password, current_user.password_hash):
         raise HTTPException(status_code=400, detail="הסיסמה הנוכחית שגויה")
-    current_user.password_hash = auth.get_password_hash(data.new_password)
-    db.commit()
+    # current_user מגיע מה־cache ומנותק מה־Session – מעדכנים את השורה עצמה
+    user = await db.scalar(select(models.User).filter_by(id=current_user.id))
+    user.password_hash = auth.get_password_hash(data.new_password)
+    await db.commit()
+    invalidate_user(user.email)
     return {"detail": "הסיסמה שונתה בהצלחה"}
 
 @app.delete("/delete-account", status_code=status.HTTP_204_NO_CONTENT)
-def delete_account(
+async def delete_account(
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db.delete(current_user)
-    db.commit()
+    user = await db.scalar(select(models.User).filter_by(id=current_user.id))
+    if user:
+        await db.delete(user)
+        await db.commit()
+    invalidate_user(current_user.email)
     return
 
 @app.get("/admin/users", response_model=List[UserAdminView])
-def get_all_users(
-    db: Session = Depends(get_db),
+async def get_all_users(
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(require_admin)
 ):
-    return db.query(models.User).all()
+    result = await db.scalars(select(models.User))
+    return result.all()
 
 # הרצה ידנית (כדי לעבוד עם `py main.py`)
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+import { useEffect, useState } from "react";
+import { Box, Typography } from "@mui/material";
+import { fetchHistory } from "../services/api";
+
+const WIDTH = 300;
+const HEIGHT = 60;
+const REFRESH_MS = 60000;
+
+// גרף קטן של מדד אחד (באחוזים) – השרת כבר מחזיר לכל היותר `points` נקודות
+function HistoryChart({ kind, resource, metric, label, hours = 24, points = 150 }) {
+  const [data, setData] = useState(null);
+  const [missing, setMissing] = useState(false);
+
+  useEffect(() => {
+    let cancelled = false;
+
+    const load = async () => {
+      const end = Math.floor(Date.now() / 1000);
+      try {
+        const history = await fetchHistory({ kind, resource, metric, start: end - hours * 3600, end, points });
+        if (!cancelled) {
+          setData(history.points);
+          setMissing(false);
+        }
+      } catch (err) {
+        if (cancelled) return;
+        if (err.status === 404) setMissing(true);
+        else console.error("שגיאה בטעינת היסטוריה:", err);
+      }
+    };
+
+    load();
+    const timer = setInterval(load, REFRESH_MS);
+    return () => {
+      cancelled = true;
+      clearInterval(timer);
+    };
+  }, [kind, resource, metric, hours, points]);
+
+  if (missing || (data && data.length < 2)) {
+    return (
+      <Typography sx={{ fontFamily: "Almoni Tzar", color: "#72767d", fontSize: 13, mt: 1 }}>
+        {`${label}: אין עדיין היסטוריה`}
+      </Typography>
+    );
+  }
+  if (!data) return null;
+
+  const first = data[0][0];
+  const span = data[data.length - 1][0] - first || 1;
+  const path = data
+    .map(([ts, value]) => `${(((ts - first) / span) * WIDTH).toFixed(1)},${(HEIGHT - (Math.min(value, 100) / 100) * HEIGHT).toFixed(1)}`)
+    .join(" ");
+  const last = data[data.length - 1][1];
+
+  return (
+    <Box sx={{ mt: 1 }}>
+      <Typography sx={{ fontFamily: "Almoni Tzar", color: "#b9bbbe", fontSize: 13 }}>
+        {`${label}: ${last.toFixed(1)}%`}
+      </Typography>
+      <svg
+        viewBox={`0 0 ${WIDTH} ${HEIGHT}`}
+        preserveAspectRatio="none"
+        style={{ width: "100%", height: HEIGHT, background: "#2f3136", borderRadius: 4 }}
+      >
+        <polyline points={path} fill="none" stroke="#7289da" strokeWidth="1.5" vectorEffect="non-scaling-stroke" />
+      </svg>
+    </Box>
+  );
+}
+
+export default HistoryChart;
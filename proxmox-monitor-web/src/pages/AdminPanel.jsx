@@ -38,6 +38,7 @@ function AdminPanel() {
   const [newUserRole, setNewUserRole] = useState("user");
   const [showAuditLog, setShowAuditLog] = useState(false);
   const [auditLogs, setAuditLogs] = useState([]);
+  const [auditCursor, setAuditCursor] = useState(null);
   const [openClearLogDialog, setOpenClearLogDialog] = useState(false);
 
   const fetchUsers = () => {
@@ -50,13 +51,18 @@ function AdminPanel() {
       .catch((err) => console.error("שגיאה בשליפת משתמשים:", err));
   };
 
-  const fetchAuditLogs = () => {
+  // עמוד ראשון, או העמוד הבא לפי ה־cursor שהשרת החזיר ב־X-Next-Cursor
+  const fetchAuditLogs = (cursor = null) => {
     const token = localStorage.getItem("token");
-    fetch(`${config.apiBaseUrl}/admin/audit-log`, {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+    fetch(`${config.apiBaseUrl}/admin/audit-log${query}`, {
       headers: { Authorization: `Bearer ${token}` }
     })
-      .then((res) => res.json())
-      .then(setAuditLogs)
+      .then((res) => {
+        setAuditCursor(res.headers.get("X-Next-Cursor"));
+        return res.json();
+      })
+      .then((logs) => setAuditLogs((prev) => (cursor ? [...prev, ...logs] : logs)))
       .catch((err) => console.error("שגיאה בטעינת לוג השינויים:", err));
   };
 
@@ -409,6 +415,16 @@ function AdminPanel() {
               ))}
             </TableBody>
           </Table>
+          {auditCursor && (
+            <div style={{ textAlign: "center", marginTop: "10px" }}>
+              <Button
+                onClick={() => fetchAuditLogs(auditCursor)}
+                style={{ fontFamily: "Almoni Tzar", backgroundColor: "#4f545c", color: "white", fontWeight: "bold" }}
+              >
+                טען עוד ⬇️
+              </Button>
+            </div>
+          )}
         </DialogContent>
         <DialogActions style={{ backgroundColor: "#2f3136", justifyContent: "center", gap: "10px" }}>
           <Button
@@ -495,6 +511,7 @@ function AdminPanel() {
                 })
                 .then(() => {
                   setAuditLogs([]);
+                  setAuditCursor(null);
                   setOpenClearLogDialog(false);
                   alert("הלוגים אופסו בהצלחה ✅");
                 })
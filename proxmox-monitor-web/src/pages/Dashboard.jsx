@@ -16,6 +16,7 @@ import {
 import ExpandMoreIcon from "@mui/icons-material/ExpandMore";
 import ExpandLessIcon from "@mui/icons-material/ExpandLess";
 import Layout from "../components/Layout";
+import HistoryChart from "../components/HistoryChart";
 import config from "../config";
 
 function Dashboard() {
@@ -26,39 +27,68 @@ function Dashboard() {
   const [errorMsg, setErrorMsg] = useState("");
   const [openSnackbar, setOpenSnackbar] = useState(false);
 
-  const fetchData = async () => {
+  const fetchAlertSettings = async () => {
     try {
       const token = localStorage.getItem("token");
+      const alertsResp = await fetch(`${config.apiBaseUrl}/dashboard/alerts`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      if (!alertsResp.ok) throw new Error("Failed to fetch alert settings");
+      setAlertSettings(await alertsResp.json());
+    } catch (err) {
+      console.error("שגיאה בטעינת הגדרות התראה:", err);
+    }
+  };
 
-      const [proxmoxResp, alertsResp] = await Promise.all([
-        fetch(`${config.apiBaseUrl}/dashboard/proxmox-status`, {
-          headers: { Authorization: `Bearer ${token}` }
-        }),
-        fetch(`${config.apiBaseUrl}/dashboard/alerts`, {
-          headers: { Authorization: `Bearer ${token}` }
-        })
-      ]);
+  // מיזוג עדכון חלקי (delta) מהשרת לתוך הנתונים הקיימים
+  const nodeKey = (node) => `${node.cluster}/${node.node}`;
 
-      if (!proxmoxResp.ok || !alertsResp.ok) throw new Error("Failed to fetch data");
+  const applyDelta = (nodes, delta) => {
+    const removedNodes = new Set((delta.removed_nodes || []).map(nodeKey));
+    const byKey = new Map(nodes.filter(node => !removedNodes.has(nodeKey(node))).map(node => [nodeKey(node), node]));
 
-      const proxmoxData = await proxmoxResp.json();
-      const alertData = await alertsResp.json();
+    for (const { cluster, node, stats, state, stale_since } of delta.nodes || []) {
+      const key = nodeKey({ cluster, node });
+      byKey.set(key, { ...(byKey.get(key) || { cluster, node, vms: [] }), stats, state, stale_since });
+    }
 
-      setProxmoxData(proxmoxData);
-      setAlertSettings(alertData);
-    } catch (err) {
+    for (const { cluster, node: nodeName, upsert, remove } of delta.vms || []) {
+      const key = nodeKey({ cluster, node: nodeName });
+      const node = byKey.get(key);
+      if (!node) continue;
+      const removed = new Set(remove);
+      const vms = new Map((node.vms || []).filter(vm => !removed.has(vm.vmid)).map(vm => [vm.vmid, vm]));
+      for (const vm of upsert) vms.set(vm.vmid, vm);
+      byKey.set(key, { ...node, vms: [...vms.values()] });
+    }
+
+    return [...byKey.values()];
+  };
+
+  useEffect(() => {
+    fetchAlertSettings();
+
+    // הנתונים נדחפים מהשרת: snapshot מלא פעם אחת, ואחריו רק שינויים
+    const source = new EventSource(`${config.apiBaseUrl}/dashboard/stream`);
+
+    source.addEventListener("snapshot", (event) => {
+      setProxmoxData(JSON.parse(event.data));
+      setLoading(false);
+    });
+
+    source.addEventListener("delta", (event) => {
+      const delta = JSON.parse(event.data);
+      setProxmoxData(prev => applyDelta(prev || [], delta));
+    });
+
+    source.onerror = (err) => {
       console.error("שגיאה בטעינת נתונים:", err);
       setErrorMsg("שגיאה בטעינת הנתונים, נסה שוב בעוד רגע");
       setOpenSnackbar(true);
-    } finally {
       setLoading(false);
-    }
-  };
+    };
 
-  useEffect(() => {
-    fetchData(); // קריאה ראשונית
-    const interval = setInterval(fetchData, 60000); // כל דקה
-    return () => clearInterval(interval); // ניקוי בעת unmount
+    return () => source.close(); // ניקוי בעת unmount
   }, []);
 
   const toggleAlert = async (key) => {
@@ -127,7 +157,7 @@ function Dashboard() {
               <Box sx={{ display: "flex", justifyContent: "center", px: 4 }}>
                 <Grid container spacing={4} sx={{ maxWidth: "1600px" }}>
                   {proxmoxData?.map(node => (
-                    <Grid item xs={12} key={node.node}>
+                    <Grid item xs={12} key={nodeKey(node)}>
                       <Card
                         sx={{
                           backgroundColor: "#2f3136",
@@ -159,12 +189,28 @@ function Dashboard() {
                                 >
                                   {`🗄️ ${node.node} :שרת מארח`}
                                 </Typography>
+                                <Typography
+                                  variant="subtitle2"
+                                  sx={{ fontFamily: "Almoni Tzar", color: "#b9bbbe", mt: 1 }}
+                                >
+                                  🌐 {node.cluster} :קלאסטר
+                                </Typography>
                                 <Typography
                                   variant="subtitle2"
                                   sx={{ fontFamily: "Almoni Tzar", color: "#b9bbbe", mt: 1 }}
                                 >
                                   🧮 {node.vms?.length || 0} :מכונות בסך הכול
                                 </Typography>
+                                {node.state && node.state !== "online" && (
+                                  <Typography
+                                    variant="subtitle2"
+                                    sx={{ fontFamily: "Almoni Tzar", color: "#faa61a", mt: 1 }}
+                                  >
+                                    {node.state === "stale"
+                                      ? `⏳ ${new Date(node.stale_since * 1000).toLocaleTimeString()} :לא זמין, נתונים מ`
+                                      : "⛔ השרת לא זמין"}
+                                  </Typography>
+                                )}
                               </Box>
 
                               <Box
@@ -190,6 +236,13 @@ function Dashboard() {
                                   💽 {`${formatStorage(node?.stats?.disk?.used || 0)} / ${formatStorage(node?.stats?.disk?.total || 0)}`} :דיסק כולל
                                 </Typography>
                               </Box>
+
+                              <HistoryChart
+                                kind="node"
+                                resource={`${node.cluster}/${node.node}`}
+                                metric="cpu"
+                                label="CPU 24h"
+                              />
                             </Box>
                           }
                           sx={{ pb: 2, borderBottom: "1px solid #4f545c", mb: 2 }}
@@ -231,7 +284,7 @@ function Dashboard() {
                           {chunkArray(sortVmsByStatus(node.vms || []), 4).map((vmChunk, chunkIdx) => (
                             <Grid container spacing={3} key={chunkIdx} sx={{ mb: 3 }}>
                               {vmChunk.map((vm, idx) => (
-                                <Grid item xs={12} sm={6} md={3} key={`${chunkIdx}-${idx}`}>
+                                <Grid item xs={12} sm={6} md={3} key={vm.vmid ?? `${chunkIdx}-${idx}`}>
                                   <Box
                                     sx={{
                                       backgroundColor: vm.status === "running" ? "#3ba55d22" : "#ed424522",
@@ -260,8 +313,13 @@ function Dashboard() {
                                     <Typography sx={{ fontFamily: "Almoni Tzar", mb: 0.5 }}>
                                       {vm.type?.toUpperCase() === "LXC" ? "CT" : "VM"} :סוג
                                     </Typography>
-                                    {vm.status === "running" ? (
+                                    {vm.status === "running" && vm.ram ? (
                                       <Box sx={{ mt: "auto", pt: 1 }}>
+                                        {vm.stale_since && (
+                                          <Typography sx={{ fontFamily: "Almoni Tzar", mb: 0.5, color: "#faa61a" }}>
+                                            {`⏳ ${new Date(vm.stale_since * 1000).toLocaleTimeString()} :לא ענתה, נתונים מ`}
+                                          </Typography>
+                                        )}
                                         <Typography sx={{ fontFamily: "Almoni Tzar", mb: 0.5 }}>
                                           🧠 %{(vm.cpu * 100).toFixed(1)} :CPU
                                         </Typography>
@@ -275,7 +333,7 @@ function Dashboard() {
                                     ) : (
                                       <Box sx={{ mt: "auto", pt: 1, opacity: 0.7, fontStyle: "italic" }}>
                                         <Typography sx={{ fontFamily: "Almoni Tzar" }}>
-                                          .המכונה כבויה כרגע, אין נתוני שימוש
+                                          {vm.status === "running" ? ".המכונה לא ענתה בזמן, אין נתוני שימוש" : ".המכונה כבויה כרגע, אין נתוני שימוש"}
                                         </Typography>
                                       </Box>
                                     )}
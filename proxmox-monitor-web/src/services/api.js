@@ -17,4 +17,23 @@ export async function login(email, password) {
 
   const data = await response.json();
   return data;
-}
\ No newline at end of file
+}
+
+// היסטוריית מדדים לגרפים – השרת מחזיר לכל היותר `points` נקודות
+export async function fetchHistory({ kind, resource, metric, start, end, points = 300 }) {
+  const params = new URLSearchParams({ kind, resource, metric, points });
+  if (start) params.append("start", start);
+  if (end) params.append("end", end);
+
+  const response = await fetch(`${config.apiBaseUrl}/dashboard/history?${params}`, {
+    headers: { Authorization: `Bearer ${localStorage.getItem("token")}` },
+  });
+
+  if (!response.ok) {
+    const error = new Error("History fetch failed");
+    error.status = response.status;
+    throw error;
+  }
+
+  return response.json();
+}